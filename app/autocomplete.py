@@ -0,0 +1,248 @@
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 한글 음절 분해용 호환 자모 테이블 (U+AC00 ~ U+D7A3)
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+JUNGSUNG_COUNT = 21
+JONGSUNG_COUNT = 28
+
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSUNG = ("", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ",
+            "ㄿ", "ㅀ", "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ")
+
+# 입력 중인 글자("보좁" -> "보조배")도 맞추기 위해 겹모음/겹받침은 낱자로 풀어서 비교
+COMPOUND_JAMO = str.maketrans({
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+})
+
+CHOSUNG_SET = frozenset(CHOSUNG)
+
+# 순위: 정확히 일치 < 이름 접두 < 이름 포함 < 초성 접두 < 초성 포함 < 자모 접두 < 자모 포함.
+# 접두 단계 안에서는 키의 사전순(정확히 일치가 맨 앞), 포함 단계 안에서는 (이름 길이, 이름, id) 순이다
+DEFAULT_LIMIT = 20
+
+_SEPARATOR = b"\n"
+
+
+def normalize(text: str) -> str:
+    return "".join(text.split()).lower()
+
+
+def to_chosung(text: str) -> str:
+    chars = []
+    for char in text:
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            chars.append(CHOSUNG[(code - HANGUL_BASE) // (JUNGSUNG_COUNT * JONGSUNG_COUNT)])
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+def to_jamo(text: str) -> str:
+    chars = []
+    for char in text:
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            offset = code - HANGUL_BASE
+            chars.append(CHOSUNG[offset // (JUNGSUNG_COUNT * JONGSUNG_COUNT)])
+            chars.append(JUNGSUNG[(offset // JONGSUNG_COUNT) % JUNGSUNG_COUNT])
+            chars.append(JONGSUNG[offset % JONGSUNG_COUNT])
+        else:
+            chars.append(char)
+    return "".join(chars).translate(COMPOUND_JAMO)
+
+
+def is_chosung_query(text: str) -> bool:
+    return bool(text) and all(char in CHOSUNG_SET for char in text)
+
+
+FORMS = ("names", "chosung", "jamo")
+
+
+def form_keys(item_name: str) -> Tuple[str, str, str]:
+    key = normalize(item_name)
+    return key, to_chosung(key), to_jamo(key)
+
+
+def rank_key(entry: Tuple) -> tuple:
+    # entry는 (id, item_name, ...)
+    return len(normalize(entry[1])), entry[1], entry[0]
+
+
+def build_forms(entries: List[Tuple[int, str]]) -> Tuple[array, Dict[str, Tuple[array, array, array, array]]]:
+    """(id, item_name) 목록으로 자동완성 열을 만든다. 스냅샷 파일에 그대로 쓰고 워커들은 매핑해서 찾는다.
+
+    순위 순서(entries 번호)와 표기별 (순위 순으로 이어 붙인 키의 UTF-8, 키 시작 위치, 사전순 키 순서,
+    키에 쓰인 글자의 UTF-8)를 반환한다. 키 i는 keys[starts[i]:starts[i + 1] - 1]이다.
+    """
+    order = sorted(range(len(entries)), key=lambda index: rank_key(entries[index]))
+    keys = [form_keys(entries[index][1]) for index in order]
+    forms = {}
+    for position, form in enumerate(FORMS):
+        encoded = [form_key[position].encode() for form_key in keys]
+        starts = array("I")
+        offset = 0
+        for key in encoded:
+            starts.append(offset)
+            offset += len(key) + len(_SEPARATOR)
+        starts.append(offset)
+        # UTF-8 바이트 순서는 문자열 순서와 같다. 같은 키끼리는 순위 순으로 둔다
+        sorted_keys = array("I", sorted(range(len(encoded)), key=lambda index: (encoded[index], index)))
+        chars = "".join(sorted(set().union(*(form_key[position] for form_key in keys))))
+        forms[form] = (array("B", _SEPARATOR.join(encoded)), starts, sorted_keys, array("B", chars.encode()))
+    return array("I", order), forms
+
+
+class FormIndex:
+    """이름/초성/자모 중 한 가지 표기의 키 열. 스냅샷 파일을 매핑한 버퍼 위에서 복사 없이 찾는다.
+
+    접두 일치는 사전순 키 순서에서 이분 탐색으로, 포함 일치는 이어 붙인 키를 buffer.find로 훑는다.
+    """
+
+    __slots__ = ("buffer", "start", "end", "starts", "order", "chars")
+
+    def __init__(self, buffer, start: int, end: int, starts: Sequence[int], order: Sequence[int], chars: str):
+        # buffer는 find(sub, start, end)와 슬라이싱을 지원하는 mmap이나 bytes, [start, end)가 이어 붙인 키다
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.starts = starts
+        self.order = order
+        self.chars = frozenset(chars)
+
+    def key(self, index: int) -> bytes:
+        return self.buffer[self.start + self.starts[index]:self.start + self.starts[index + 1] - len(_SEPARATOR)]
+
+    def prefix_matches(self, query: str) -> Iterator[int]:
+        prefix = query.encode()
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(self.order[middle]) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        while low < len(self.order):
+            index = self.order[low]
+            if not self.key(index).startswith(prefix):
+                return
+            yield index
+            low += 1
+
+    def substring_matches(self, query: str) -> Iterator[int]:
+        # 어느 키에도 없는 글자가 있으면 전체를 훑지 않는다 (이름 표기에 없는 자모 검색어 등)
+        if not self.chars.issuperset(query):
+            return
+        needle = query.encode()
+        # 키마다 첫 일치만 보고 다음 키로 건너뛰므로, 한 글자 검색어도 반복 횟수가 일치한 키 수를 넘지 않는다
+        last = len(self.starts) - 2
+        position = self.buffer.find(needle, self.start, self.end)
+        while position != -1:
+            offset = position - self.start
+            index = bisect_right(self.starts, offset) - 1
+            # 키 앞에서 일치하면 접두 단계에서 이미 나왔다
+            if offset != self.starts[index]:
+                yield index
+            if index == last:
+                return
+            position = self.buffer.find(needle, self.start + self.starts[index + 1], self.end)
+
+
+EMPTY_FORM = FormIndex(b"", 0, 0, [0], [], "")
+
+
+class _Snapshot:
+    __slots__ = ("count", "entry", "names", "chosung", "jamo", "pending")
+
+    def __init__(self, count: int, entry: Callable[[int], Tuple[int, str, Optional[str]]], forms: Dict[str, FormIndex]):
+        # entry(i)는 순위 i번째 (id, item_name, category_image). 포함 단계는 앞에서부터 limit개만 찾고 멈춘다
+        self.count = count
+        self.entry = entry
+        self.names, self.chosung, self.jamo = (forms[form] for form in FORMS)
+        # 다음 load() 전까지 add()로 덧붙인 (엔트리, 이름 키, 초성 키, 자모 키). 수가 적어 직접 비교한다
+        self.pending = ()
+
+    def with_entry(self, entry: Tuple[int, str, Optional[str]]) -> "_Snapshot":
+        snapshot = _Snapshot(self.count, self.entry, {"names": self.names, "chosung": self.chosung, "jamo": self.jamo})
+        snapshot.pending = self.pending + ((entry, *form_keys(entry[1])),)
+        return snapshot
+
+
+class AutocompleteIndex:
+    """검색어 자동완성 인덱스.
+
+    카탈로그 스냅샷 파일의 자동완성 열(build_forms)을 그대로 읽어 접두/포함/초성/자모 일치 순으로
+    순위를 매겨 돌려준다. 워커마다 키를 메모리에 복사하지 않으므로 워커 수가 늘어도 메모리는 그대로다.
+    load()는 참조만 바꿔 끼우므로 조회 중인 요청은 락 없이 이전 스냅샷을 끝까지 사용한다.
+    """
+
+    def __init__(self):
+        self._snapshot = _Snapshot(0, None, {form: EMPTY_FORM for form in FORMS})
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._snapshot.count + len(self._snapshot.pending)
+
+    def load(self, count: int, entry: Callable[[int], Tuple[int, str, Optional[str]]], forms: Dict[str, FormIndex]):
+        snapshot = _Snapshot(count, entry, forms)
+        with self._lock:
+            self._snapshot = snapshot
+
+    def add(self, id: int, item_name: str, category_image: Optional[str]):
+        # 품목 하나를 추가할 때마다 전체를 다시 만들지 않고 덧붙인다. 품목을 추가하면 카탈로그 버전이 바뀌므로
+        # 덧붙인 품목은 다음 스냅샷 갱신(snapshot.check_interval 이내)에서 새 스냅샷 파일에 합쳐진다
+        if not item_name:
+            return
+        with self._lock:
+            self._snapshot = self._snapshot.with_entry((id, item_name, category_image))
+
+    def search(self, term: str, limit: int = DEFAULT_LIMIT) -> List[dict]:
+        query = normalize(term)
+        if not query:
+            return []
+
+        snapshot = self._snapshot
+        # (표기, 덧붙인 품목에서 그 표기 키의 위치, 검색어)
+        forms = [(snapshot.names, 0, query)]
+        if is_chosung_query(query):
+            forms.append((snapshot.chosung, 1, query))
+        forms.append((snapshot.jamo, 2, to_jamo(query)))
+
+        results: List[Tuple[int, str, Optional[str]]] = []
+        seen = set()
+        for form, key_position, form_query in forms:
+            for prefix in (True, False):
+                need = limit - len(results)
+                if need <= 0:
+                    break
+                matches = form.prefix_matches(form_query) if prefix else form.substring_matches(form_query)
+                tier = []
+                for index in matches:
+                    entry = snapshot.entry(index)
+                    if entry[0] not in seen:
+                        tier.append((form.key(index).decode(), entry))
+                        if len(tier) >= need:
+                            break
+                for entry, *keys in snapshot.pending:
+                    key = keys[key_position]
+                    if entry[0] not in seen and (key.startswith(form_query) if prefix else key.find(form_query) > 0):
+                        tier.append((key, entry))
+                if len(tier) > need or snapshot.pending:
+                    tier.sort(key=lambda match: (match[0], rank_key(match[1])) if prefix else rank_key(match[1]))
+                    del tier[need:]
+                for _, entry in tier:
+                    seen.add(entry[0])
+                    results.append(entry)
+
+        return [{"id": id, "item_name": item_name, "category_image": category_image}
+                for id, item_name, category_image in results]
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import codecs
+import csv
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import SEARCH_CACHE_KIND, item_response_cache, negative_cache
+from app.crud import insert_prohibited_items, invalidate_item_responses
+from app.database import SessionLocal
+from app.schemas import ConditionCreate, ImportFormat, ImportResult, ImportRowError, ProhibitedItemCreate
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# CSV는 조건 한 건이 한 행이고, 연속된 행의 품목 정보(이름, 이미지, 소분류)가 같으면 한 품목으로 묶는다.
+# 조건 칸이 비어 있는 행은 조건 없는 품목이다.
+CSV_COLUMNS = ("item_name", "image_path", "subcategory_id", "condition", "allowed", "flight_option_id", "field_option_id")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, dict]]:
+    header = None
+    record_lines: List[str] = []
+    row_number = 0
+
+    async for line in lines:
+        row_number += 1
+        record_lines.append(line)
+        # 따옴표 안에 줄바꿈이 있는 필드는 따옴표 짝이 맞을 때까지 다음 줄을 이어 붙인다
+        if sum(part.count('"') for part in record_lines) % 2:
+            continue
+        record, record_lines = record_lines, []
+        if not any(part.strip() for part in record):
+            continue
+
+        values = next(csv.reader("\n".join(record).splitlines(keepends=True)))
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        yield row_number - len(record) + 1, dict(zip(header, values))
+
+
+def _item_key(row: dict) -> tuple:
+    return row.get("item_name"), row.get("image_path"), row.get("subcategory_id")
+
+
+def _build_item(rows: List[dict]) -> ProhibitedItemCreate:
+    first = rows[0]
+    return ProhibitedItemCreate(
+        item_name=first.get("item_name"),
+        image_path=first.get("image_path"),
+        subcategory_id=first.get("subcategory_id"),
+        conditions=[
+            ConditionCreate(
+                condition=row.get("condition"),
+                allowed=row.get("allowed"),
+                flight_option_id=row.get("flight_option_id"),
+                field_option_id=row.get("field_option_id")
+            )
+            for row in rows if row.get("condition")
+        ]
+    )
+
+
+async def iter_csv_items(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[ProhibitedItemCreate], Optional[str]]]:
+    group: List[dict] = []
+    group_row = 0
+
+    async for row_number, row in iter_csv_rows(lines):
+        if group and _item_key(row) == _item_key(group[0]):
+            group.append(row)
+            continue
+        if group:
+            yield _validate(group_row, lambda: _build_item(group))
+        group, group_row = [row], row_number
+
+    if group:
+        yield _validate(group_row, lambda: _build_item(group))
+
+
+async def iter_jsonl_items(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[ProhibitedItemCreate], Optional[str]]]:
+    row_number = 0
+    async for line in lines:
+        row_number += 1
+        if line.strip():
+            yield _validate(row_number, lambda: ProhibitedItemCreate.model_validate_json(line))
+
+
+def _validate(row_number: int, build) -> Tuple[int, Optional[ProhibitedItemCreate], Optional[str]]:
+    try:
+        return row_number, build(), None
+    except ValidationError as e:
+        return row_number, None, "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+        )
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[ImportRowError] = []
+
+    def add_error(self, row_number: int, error: str):
+        self.failed += 1
+        # 파일이 통째로 잘못돼도 메모리가 늘지 않도록 보고하는 오류 수는 제한한다
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(row=row_number, error=error))
+
+    def result(self) -> ImportResult:
+        return ImportResult(imported=self.imported, failed=self.failed, errors=self.errors)
+
+
+async def _write_chunk(db: AsyncSession, chunk: List[Tuple[int, ProhibitedItemCreate]], report: ImportReport):
+    item_ids: List[int] = []
+    try:
+        item_ids = await insert_prohibited_items(db, [item for _, item in chunk])
+        await db.commit()
+        report.imported += len(chunk)
+    except SQLAlchemyError:
+        await db.rollback()
+        item_ids = []
+        # 청크 전체가 실패하면 어떤 행이 문제인지 알 수 있도록 세이브포인트로 한 건씩 다시 넣는다
+        for row_number, item in chunk:
+            try:
+                async with db.begin_nested():
+                    item_ids += await insert_prohibited_items(db, [item])
+                report.imported += 1
+            except SQLAlchemyError as e:
+                report.add_error(row_number, str(e.orig if getattr(e, "orig", None) else e).splitlines()[0])
+        await db.commit()
+    db.expunge_all()
+    invalidate_item_responses(item_ids)
+    # 자동완성은 카탈로그 스냅샷을 다시 만들 때 반영되지만, DB 조회는 커밋된 청크의 품목을 바로 찾는다
+    item_response_cache.invalidate_kind(SEARCH_CACHE_KIND)
+    negative_cache.invalidate()
+
+
+async def import_items(db: AsyncSession, chunks: AsyncIterator[bytes], format: ImportFormat,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> ImportResult:
+    lines = iter_lines(chunks)
+    items = iter_csv_items(lines) if format == ImportFormat.csv else iter_jsonl_items(lines)
+
+    report = ImportReport()
+    chunk: List[Tuple[int, ProhibitedItemCreate]] = []
+    async for row_number, item, error in items:
+        if error is not None:
+            report.add_error(row_number, error)
+            continue
+        chunk.append((row_number, item))
+        if len(chunk) >= chunk_size:
+            await _write_chunk(db, chunk, report)
+            chunk = []
+    if chunk:
+        await _write_chunk(db, chunk, report)
+    return report.result()
+
+
+async def iter_file(path: str, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while True:
+            chunk = await asyncio.to_thread(file.read, size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def main(path: str, format: ImportFormat, chunk_size: int):
+    async with SessionLocal() as db:
+        result = await import_items(db, iter_file(path), format, chunk_size)
+    print(result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV/JSONL 파일의 금지 품목과 조건을 일괄 등록합니다.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=[format.value for format in ImportFormat])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    format = ImportFormat(args.format or ("csv" if args.path.endswith(".csv") else "jsonl"))
+    asyncio.run(main(args.path, format, args.chunk_size))
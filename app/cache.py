@@ -0,0 +1,264 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.autocomplete import normalize
+from app.database import settings
+
+
+# 품목 응답 캐시의 검색어 키 종류 ("search", 검색어, 항공편 범위, 검색 모드)
+SEARCH_CACHE_KIND = "search"
+
+# 다음 페이지 커서는 본문 형식(목록)을 바꾸지 않도록 응답 헤더로 내려준다. 마지막 페이지에는 없다
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class CachedPayload(NamedTuple):
+    body: bytes
+    etag: str
+    version: int
+    expires_at: float
+    next_cursor: Optional[str] = None
+
+
+def make_etag(body: bytes) -> str:
+    # 본문 해시로 만든 strong ETag. 같은 데이터면 어느 워커가 응답해도 값이 같다
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def etag_response(request: Request, payload: CachedPayload, cache_control: str = "public, no-cache") -> Response:
+    # 본문은 GZipMiddleware가 Accept-Encoding에 따라 압축할 수 있으므로, 인코딩과 무관하게 같은 값인 weak ETag로 내보낸다
+    headers = {"ETag": "W/" + payload.etag, "Cache-Control": cache_control}
+    if payload.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = payload.next_cursor
+    if etag_matches(request, payload.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+class ReferenceDataCache:
+    """관리자 폼으로만 바뀌는 참조 데이터(분류, 소분류, 항공편/반입 옵션)의 직렬화 결과 캐시.
+
+    쓰기 경로에서 invalidate()로 버전을 올리면 이전 버전 항목은 더 이상 쓰이지 않는다.
+    다른 워커의 쓰기는 알 수 없으므로 ttl이 지나면 DB에서 다시 읽는다.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._entries: Dict[str, CachedPayload] = {}
+        self._adapters: Dict[type, TypeAdapter] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def _adapter(self, schema: type) -> TypeAdapter:
+        adapter = self._adapters.get(schema)
+        if adapter is None:
+            adapter = self._adapters[schema] = TypeAdapter(List[schema])
+        return adapter
+
+    def encode(self, schema: type, rows: list, next_cursor: Optional[str] = None) -> CachedPayload:
+        adapter = self._adapter(schema)
+        body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+        return CachedPayload(body, make_etag(body), self.version, time.monotonic() + self.ttl, next_cursor)
+
+    async def get(self, key: str, schema: type, fetch: Callable[[], Awaitable[list]],
+                  paginate: Optional[Callable[[list], Tuple[list, Optional[str]]]] = None) -> CachedPayload:
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == self.version and entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        version = self.version
+        rows = await fetch()
+        # 페이지 단위로 읽는 목록은 (이번 페이지 행, 다음 커서)로 나눠 커서도 함께 캐시한다
+        entry = self.encode(schema, *paginate(rows)) if paginate else self.encode(schema, rows)
+
+        # 읽는 도중 invalidate()가 불렸다면 낡은 결과일 수 있으므로 저장하지 않는다
+        if version == self.version:
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"version": self.version, "size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class CachedItemResponse(NamedTuple):
+    body: bytes
+    item_id: int
+    item_name: str
+
+
+class LRUCache:
+    """크기 제한과 TTL이 있는 LRU 캐시.
+
+    값마다 품목 id를 함께 저장해 두어 품목이 바뀌면 그 품목의 모든 키(id/검색어 x 항공편 범위)를
+    한 번에 지운다. 크기 산정을 위해 적중/미스/축출 횟수를 센다.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._keys_by_item: Dict[int, Set[Hashable]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, item_id = entry
+        if expires_at <= time.monotonic():
+            self._remove(key, item_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, item_id: int):
+        if key in self._entries:
+            self._remove(key, self._entries[key][2])
+        self._entries[key] = (value, time.monotonic() + self.ttl, item_id)
+        self._keys_by_item.setdefault(item_id, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest_key, (_, _, oldest_item_id) = next(iter(self._entries.items()))
+            self._remove(oldest_key, oldest_item_id)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable, item_id: int):
+        self._entries.pop(key, None)
+        keys = self._keys_by_item.get(item_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_item[item_id]
+
+    def invalidate_item(self, item_id: int):
+        for key in self._keys_by_item.pop(item_id, ()):
+            self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def invalidate_kind(self, kind: str):
+        # 키의 첫 값이 kind인 항목을 모두 지운다. 새 품목이 기존 검색어의 결과(순위 검색의 대체 품목 등)를
+        # 바꿀 수 있으므로 품목을 추가하면 검색어 키("search", ...)를 비운다
+        for key in [key for key in self._entries if key[0] == kind]:
+            self._remove(key, self._entries[key][2])
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_item.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+def search_miss_key(kind: str, term: str, mode: str) -> tuple:
+    # 기본 자동완성은 정규화한 검색어로만 찾으므로 정규화 결과가 같은 검색어끼리 미스를 공유한다.
+    # 이름 일치/순위 검색은 원문으로 비교하므로 검색어를 그대로 키로 쓴다
+    if kind == "items" and mode == "basic":
+        term = normalize(term)
+    return (kind, mode, term)
+
+
+class NegativeCache:
+    """결과가 없었던 검색어를 기억해 두는 크기 제한과 TTL이 있는 LRU.
+
+    알려진 미스는 인덱스/DB를 다시 훑지 않고 바로 404를 반환한다. 품목이 추가되면 invalidate()로
+    버전을 올려 전부 비우고, 조회 전에 읽어 둔 버전이 그 사이 바뀌었으면 결과를 저장하지 않는다.
+    다른 워커의 추가는 공유 스냅샷이 갱신될 때 비워지며, 그 전까지는 ttl로 묶어 둔다.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._entries.get(key)
+        if expires_at is None or expires_at <= time.monotonic():
+            if expires_at is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def add(self, key: Hashable, version: int):
+        if version != self.version:
+            return
+        self._entries[key] = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        self.version += 1
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+reference_cache = ReferenceDataCache(settings.cache_reference_ttl)
+item_response_cache = LRUCache(settings.cache_items_maxsize, settings.cache_items_ttl)
+negative_cache = NegativeCache(settings.cache_negative_maxsize, settings.cache_negative_ttl)
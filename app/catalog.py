@@ -0,0 +1,144 @@
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, List
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import (
+    CATALOG_ITEM, CATALOG_SUBCATEGORY,
+    get_catalog_changes, get_catalog_items, get_catalog_version, get_categories, get_conditions_for_items,
+    get_field_options, get_flight_options, get_subcategories, get_subcategories_by_ids, get_verdicts_for_items
+)
+from app.database import SessionLocal
+from app.replicas import replica_router
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CATALOG_FORMAT = 1
+EXPORT_BATCH_SIZE = 1000
+DEFAULT_CHANGES_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+
+
+def line(record: dict) -> bytes:
+    return orjson.dumps(record) + b"\n"
+
+
+async def snapshot_session(session_factory: Callable[[], AsyncSession]) -> AsyncSession:
+    # 내보내기 전체가 한 시점의 스냅샷을 보도록 REPEATABLE READ 트랜잭션으로 읽는다
+    db = session_factory()
+    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    return db
+
+
+async def item_lines(db: AsyncSession, items: list) -> List[bytes]:
+    item_ids = [item.id for item in items]
+    conditions: Dict[int, list] = defaultdict(list)
+    for condition in await get_conditions_for_items(db, item_ids):
+        conditions[condition.prohibited_item_id].append({
+            "flight_option_id": condition.flight_option_id,
+            "field_option_id": condition.field_option_id,
+            "allowed": condition.allowed,
+            "condition": condition.condition,
+        })
+    verdicts: Dict[int, dict] = defaultdict(dict)
+    for verdict in await get_verdicts_for_items(db, item_ids):
+        verdicts[verdict.prohibited_item_id][verdict.scope] = {
+            "flight_option": verdict.flight_option, "cabin": verdict.cabin, "trust": verdict.trust
+        }
+    return [line({
+        "type": "item",
+        "id": item.id,
+        "item_name": item.item_name,
+        "subcategory_id": item.subcategory_id,
+        "image_path": item.image_path,
+        "conditions": conditions[item.id],
+        "verdicts": verdicts[item.id],
+    }) for item in items]
+
+
+def subcategory_line(subcategory) -> bytes:
+    return line({"type": "subcategory", "id": subcategory.id, "category_id": subcategory.category_id, "name": subcategory.name})
+
+
+async def stream_export() -> AsyncIterator[bytes]:
+    """전체 카탈로그를 NDJSON으로 내보낸다.
+
+    첫 줄의 version까지 반영된 상태이며, 클라이언트는 이후 이 버전으로 /catalog/changes를 호출해 따라간다.
+    응답이 끝날 때까지 요청의 DB 세션이 닫히므로 자체 세션을 연다. 가장 무거운 읽기라 복제본에서 읽으며,
+    복제본이 조금 뒤처져 있어도 header의 version이 그 스냅샷의 버전이라 이후 변경분 동기화로 따라잡는다.
+    """
+    db = await snapshot_session(replica_router.session)
+    try:
+        version = await get_catalog_version(db)
+        yield line({"type": "header", "format": CATALOG_FORMAT, "version": version})
+
+        for category in await get_categories(db):
+            yield line({"type": "category", "id": category.id, "name": category.name, "image": category.image})
+        for subcategory in await get_subcategories(db):
+            yield subcategory_line(subcategory)
+        for option in await get_flight_options(db):
+            yield line({"type": "flight_option", "id": option.id, "option": option.option})
+        for option in await get_field_options(db):
+            yield line({"type": "field_option", "id": option.id, "option": option.option})
+
+        # 품목은 id keyset 배치로 읽어 메모리 사용량을 배치 크기로 묶어 둔다
+        count, after_id = 0, None
+        while True:
+            items = await get_catalog_items(db, after_id=after_id, limit=EXPORT_BATCH_SIZE)
+            if not items:
+                break
+            yield b"".join(await item_lines(db, items))
+            count += len(items)
+            after_id = items[-1].id
+
+        yield line({"type": "end", "version": version, "items": count})
+    finally:
+        await db.close()
+
+
+async def stream_changes(since: int, limit: int) -> AsyncIterator[bytes]:
+    """since 이후 바뀐 품목과 소분류의 현재 상태를 NDJSON으로 내보낸다.
+
+    같은 대상이 여러 번 바뀌었어도 최신 상태 한 줄만 보내므로 크기는 변경된 대상 수에 비례한다.
+    변경 로그 limit건을 넘으면 more가 true이고, 클라이언트는 version으로 다시 요청한다.
+    since 검사와 같은 기준이 되도록 프라이머리에서 읽는다.
+    """
+    db = await snapshot_session(SessionLocal)
+    try:
+        changes = await get_catalog_changes(db, since, limit + 1)
+        more = len(changes) > limit
+        if more:
+            changes = changes[:limit]
+            version = changes[-1].version
+        else:
+            version = await get_catalog_version(db)
+
+        # 대상별로 중복을 없애되 변경 순서는 유지한다 (dict를 순서 있는 집합으로 쓴다)
+        changed: Dict[str, dict] = {CATALOG_ITEM: {}, CATALOG_SUBCATEGORY: {}}
+        for change in changes:
+            if change.entity in changed:
+                changed[change.entity][change.entity_id] = None
+        yield line({"type": "header", "format": CATALOG_FORMAT, "since": since, "version": version, "more": more})
+
+        found: Dict[str, set] = {CATALOG_ITEM: set(), CATALOG_SUBCATEGORY: set()}
+        subcategory_ids = list(changed[CATALOG_SUBCATEGORY])
+        if subcategory_ids:
+            for subcategory in await get_subcategories_by_ids(db, subcategory_ids):
+                found[CATALOG_SUBCATEGORY].add(subcategory.id)
+                yield subcategory_line(subcategory)
+
+        item_ids = list(changed[CATALOG_ITEM])
+        for start in range(0, len(item_ids), EXPORT_BATCH_SIZE):
+            items = await get_catalog_items(db, ids=item_ids[start:start + EXPORT_BATCH_SIZE])
+            found[CATALOG_ITEM].update(item.id for item in items)
+            yield b"".join(await item_lines(db, items))
+
+        # 로그에는 있지만 지금은 없는 대상은 삭제로 알린다
+        for entity, ids in changed.items():
+            for entity_id in ids:
+                if entity_id not in found[entity]:
+                    yield line({"type": "deleted", "entity": entity, "id": entity_id})
+
+        yield line({"type": "end", "version": version})
+    finally:
+        await db.close()
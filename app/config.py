@@ -1,15 +1,63 @@
+from functools import lru_cache
+from typing import List
+
 import yaml
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str
+    search_history_flush_interval: float = 5.0
+    search_history_max_pending: int = 100000
+    cache_reference_ttl: float = 60.0
+    cache_items_maxsize: int = 2048
+    cache_items_ttl: float = 300.0
+    cache_negative_maxsize: int = 10000
+    cache_negative_ttl: float = 60.0
+    trending_refresh_interval: float = 60.0
+    trending_top_k: int = 100
+    rate_limit_storage_uri: str = "sqlite://"
+    rate_limit_live_search_rate: float = 10.0
+    rate_limit_live_search_burst: int = 20
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    pool_statement_timeout: int = 15000
+    warmup_concurrency: int = 3
+    warmup_step_timeout: float = 120.0
+    warmup_retry_interval: float = 5.0
+    compression_minimum_size: int = 1024
+    compression_level: int = 6
+    static_max_age: int = 86400
+    replica_urls: List[str] = []
+    replica_max_lag: float = 5.0
+    replica_check_interval: float = 5.0
+    snapshot_path: str = "/dev/shm/airsafe-catalog.snapshot"
+    snapshot_check_interval: float = 10.0
+    profiling_enabled: bool = False
+    profiling_slow_query_ms: float = 200.0
+    profiling_explain_sample_rate: float = 0.0
+    profiling_log_parameters: bool = True
 
     class Config:
         env_file = ".env"
 
+def make_database_url(db_config: dict) -> str:
+    return f"postgresql+asyncpg://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+
+# 설정 파일은 프로세스당 한 번만 읽는다
+@lru_cache
 def get_settings():
     with open("./config.yml", "r") as file:
         config = yaml.safe_load(file)
     db_config = config['db']
-    database_url = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
-    return Settings(database_url=database_url)
\ No newline at end of file
+    database_url = make_database_url(db_config)
+    # 선택 섹션(search_history, cache, trending ...)의 키는 "섹션_키" 이름의 설정 값으로 펼친다
+    options = {}
+    for section in ("search_history", "cache", "trending", "rate_limit", "pool", "warmup", "compression", "static", "replica", "snapshot", "profiling"):
+        for key, value in (config.get(section) or {}).items():
+            options[f"{section}_{key}"] = value
+    # 복제본은 host/port만 적어도 되고, 생략한 접속 정보는 db 섹션 값을 쓴다
+    options["replica_urls"] = [make_database_url({**db_config, **replica}) for replica in options.pop("replica_hosts", None) or []]
+    return Settings(database_url=database_url, **options)
\ No newline at end of file
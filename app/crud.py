@@ -1,125 +1,300 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import bindparam
-from app.models import Category, SearchHistory, ProhibitedItem, SearchHistory, Suggestion, Subcategory, Condition, FlightOption, FieldOption
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import bindparam, delete, exists, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from app.models import Category, SearchHistory, ProhibitedItem, SearchHistory, Suggestion, Subcategory, Condition, FlightOption, FieldOption, ItemVerdict, SearchHistoryHourly, CatalogChange
 from app.schemas import ProhibitedItemCreate, SuggestionCreate, ConditionCreate, SubcategoryCreate
-import asyncio
-from typing import List
+from app.autocomplete import autocomplete_index
+from app.replicas import replica_router
+from app.verdicts import SCOPES, build_verdict_row
+from app.cache import SEARCH_CACHE_KIND, item_response_cache, negative_cache, reference_cache
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
-def search_subcategory_with_items(db: Session, search_term: str):
-    subcategory = db.query(Subcategory).filter(Subcategory.name.ilike(f'%{search_term}%')).first()
+async def search_subcategory_with_items(db: AsyncSession, search_term: str):
+    result = await db.execute(select(Subcategory).where(Subcategory.name.ilike(f'%{search_term}%')).limit(1))
+    subcategory = result.scalars().first()
     if subcategory:
-        items = db.query(ProhibitedItem).filter(ProhibitedItem.subcategory_id == subcategory.id).all()
-        return subcategory, items
+        result = await db.execute(select(ProhibitedItem).where(ProhibitedItem.subcategory_id == subcategory.id))
+        return subcategory, result.scalars().all()
     return None, []
 
-async def create_prohibited_item(db: Session, item: ProhibitedItemCreate):
+async def create_prohibited_item(db: AsyncSession, item: ProhibitedItemCreate):
     db_item = ProhibitedItem(**item.model_dump())
     db.add(db_item)
-    await asyncio.to_thread(db.commit)
-    await asyncio.to_thread(db.refresh, db_item)
+    await db.flush()
+    await record_catalog_changes(db, CATALOG_ITEM, [db_item.id])
+    await db.commit()
+    item_response_cache.invalidate_kind(SEARCH_CACHE_KIND)
+    negative_cache.invalidate()
+    await db.refresh(db_item)
     return db_item
 
-def search_prohibited_items(db: Session, query: str):
-    items = db.query(ProhibitedItem).filter(ProhibitedItem.item_name.ilike(f'%{query}%')).all()
-    return items
-
-async def create_search_history(db: Session, search_term: str, prohibited_item_id: int = None):
-    existing_record = db.query(SearchHistory).filter(SearchHistory.search_term == search_term).first()
-    if existing_record:
-        existing_record.search_count += 1
-        await asyncio.to_thread(db.commit)
-        await asyncio.to_thread(db.refresh, existing_record)
-        return existing_record
-    else:
-        search_history = SearchHistory(search_term=search_term, prohibited_item_id=prohibited_item_id)
-        db.add(search_history)
-        await asyncio.to_thread(db.commit)
-        await asyncio.to_thread(db.refresh, search_history)
-        return search_history
-
-def get_flight_option_id(db: Session, option_name: str):
-    flight_option = db.query(FlightOption).filter(FlightOption.option == option_name).first()
+async def search_prohibited_items_ranked(db: AsyncSession, query: str, limit: int = 20):
+    # search_vector(GIN)와 item_name 트라이그램(GIN) 인덱스를 함께 타는 순위 검색. 오타도 유사도로 매칭된다
+    ts_query = func.plainto_tsquery('simple', query)
+    rank = func.ts_rank(ProhibitedItem.search_vector, ts_query) + func.word_similarity(query, ProhibitedItem.item_name)
+    result = await db.execute(
+        select(ProhibitedItem.id, ProhibitedItem.item_name, Category.image.label("category_image"))
+            .outerjoin(Subcategory, ProhibitedItem.subcategory_id == Subcategory.id)
+            .outerjoin(Category, Subcategory.category_id == Category.id)
+            .where(or_(
+                ProhibitedItem.search_vector.op('@@')(ts_query),
+                ProhibitedItem.item_name.op('%>')(query)
+            ))
+            .order_by(rank.desc(), ProhibitedItem.id)
+            .limit(limit)
+    )
+    return result.all()
+
+async def upsert_search_history_counts(db: AsyncSession, counts: Dict[str, Tuple[int, Optional[int]]], bucket_start: datetime, batch_size: int = 1000):
+    # 검색어 순으로 정렬해 여러 워커가 동시에 flush해도 행 잠금 순서가 같도록 한다
+    rows = [
+        {"search_term": search_term, "search_count": count, "prohibited_item_id": prohibited_item_id}
+        for search_term, (count, prohibited_item_id) in sorted(counts.items())
+    ]
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(SearchHistory).values(rows[start:start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SearchHistory.search_term],
+            set_={
+                "search_count": SearchHistory.search_count + stmt.excluded.search_count,
+                "prohibited_item_id": func.coalesce(stmt.excluded.prohibited_item_id, SearchHistory.prohibited_item_id)
+            }
+        )
+        await db.execute(stmt)
+
+    # 인기 검색어 집계는 품목이 있는 검색어만 시간 단위 버킷에 누적한다
+    hourly_rows = [dict(row, bucket_start=bucket_start) for row in rows if row["prohibited_item_id"] is not None]
+    for start in range(0, len(hourly_rows), batch_size):
+        stmt = insert(SearchHistoryHourly).values(hourly_rows[start:start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SearchHistoryHourly.bucket_start, SearchHistoryHourly.search_term],
+            set_={
+                "search_count": SearchHistoryHourly.search_count + stmt.excluded.search_count,
+                "prohibited_item_id": stmt.excluded.prohibited_item_id
+            }
+        )
+        await db.execute(stmt)
+    await db.commit()
+
+async def get_trending_search_terms(db: AsyncSession, since: datetime, limit: int):
+    total = func.sum(SearchHistoryHourly.search_count).label("search_count")
+    result = await db.execute(
+        select(SearchHistoryHourly.search_term, func.max(SearchHistoryHourly.prohibited_item_id).label("prohibited_item_id"), total)
+            .where(SearchHistoryHourly.bucket_start >= since)
+            .group_by(SearchHistoryHourly.search_term)
+            .order_by(total.desc(), SearchHistoryHourly.search_term)
+            .limit(limit)
+    )
+    return result.all()
+
+async def delete_search_history_buckets(db: AsyncSession, before: datetime):
+    await db.execute(delete(SearchHistoryHourly).where(SearchHistoryHourly.bucket_start < before))
+    await db.commit()
+
+async def get_flight_option_id(db: AsyncSession, option_name: str):
+    result = await db.execute(select(FlightOption).where(FlightOption.option == option_name).limit(1))
+    flight_option = result.scalars().first()
     return flight_option.id if flight_option else None
 
-def get_item_conditions(db: Session, prohibited_item_id: int, is_international: bool = None, is_domestic: bool = None):
+def get_flight_option_ids(is_international: bool = None, is_domestic: bool = None) -> List[int]:
     flight_option_ids = []
 
     international_id = 1  # 국제선 ID
     domestic_id = 2       # 국내선 ID
-    
+
     if is_international:
         flight_option_ids.append(international_id)  # 국제선
     if is_domestic:
         flight_option_ids.append(domestic_id)  # 국내선
 
-    if len(flight_option_ids) > 0:
-        conditions = db.query(Condition).filter(
-            Condition.prohibited_item_id == prohibited_item_id,
-            Condition.flight_option_id.in_(flight_option_ids)
-        ).all()
+    return flight_option_ids
+
+async def get_item_verdict(db: AsyncSession, scope: str, id: int = None, name: str = None) -> Optional[ItemVerdict]:
+    query = select(ItemVerdict).where(ItemVerdict.scope == scope)
+    if id is not None:
+        query = query.where(ItemVerdict.prohibited_item_id == id)
     else:
-        conditions = db.query(Condition).filter(
-            Condition.prohibited_item_id == prohibited_item_id
-        ).all()
-    
-    return conditions
+        query = query.where(ItemVerdict.item_name == name).order_by(ItemVerdict.prohibited_item_id).limit(1)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def get_item_verdicts(db: AsyncSession, scope: str, ids: List[int], names: List[str]) -> List[ItemVerdict]:
+    # 여러 품목의 판정을 id/이름 IN 조건 한 번으로 읽는다
+    filters = []
+    if ids:
+        filters.append(ItemVerdict.prohibited_item_id.in_(ids))
+    if names:
+        filters.append(ItemVerdict.item_name.in_(names))
+    if not filters:
+        return []
 
-def get_prohibited_item_by_id(db: Session, id: int) -> ProhibitedItem:
-    item = db.query(ProhibitedItem).filter(ProhibitedItem.id == id).first()
-    return item
+    result = await db.execute(
+        select(ItemVerdict)
+            .where(ItemVerdict.scope == scope, or_(*filters))
+            .order_by(ItemVerdict.prohibited_item_id)
+    )
+    return result.scalars().all()
+
+def invalidate_item_responses(item_ids: List[int]):
+    # 판정을 다시 계산한 품목의 상세 응답 캐시를 지운다. 커밋 전에 지우면 그 사이 이전 판정이 다시 캐시되므로 커밋한 뒤에 부른다
+    for item_id in item_ids:
+        item_response_cache.invalidate_item(item_id)
+
+async def refresh_item_verdicts(db: AsyncSession, item_ids: List[int]):
+    # 호출한 쪽의 트랜잭션 안에서 판정 테이블을 다시 계산한다. commit과 invalidate_item_responses는 호출한 쪽에서 한다
+    result = await db.execute(
+        select(ProhibitedItem)
+            .options(
+                joinedload(ProhibitedItem.subcategory).joinedload(Subcategory.category),
+                joinedload(ProhibitedItem.conditions).joinedload(Condition.field_option),
+                joinedload(ProhibitedItem.conditions).joinedload(Condition.flight_option)
+            )
+            .where(ProhibitedItem.id.in_(item_ids))
+            .execution_options(populate_existing=True)
+    )
+    items = result.unique().scalars().all()
 
+    rows = []
+    for item in items:
+        for scope, (is_international, is_domestic) in SCOPES.items():
+            flight_option_ids = get_flight_option_ids(is_international, is_domestic)
+            conditions = [condition for condition in item.conditions
+                          if not flight_option_ids or condition.flight_option_id in flight_option_ids]
+            rows.append(build_verdict_row(item, conditions, scope))
 
-def get_condition_by_name(db: Session, name: str):
-    item = db.query(ProhibitedItem).filter(ProhibitedItem.item_name == name).first()
-    return item
+    await db.execute(delete(ItemVerdict).where(ItemVerdict.prohibited_item_id.in_(item_ids)))
+    if rows:
+        await db.execute(insert(ItemVerdict.__table__), rows)
+
+# 판정 백필을 여러 워커가 동시에 돌릴 때 배치를 하나씩 번갈아 채우도록 잡는 advisory lock 키
+VERDICT_BACKFILL_LOCK_KEY = 7_240_417
+
+async def refresh_missing_item_verdicts(db: AsyncSession, batch_size: int = 500) -> int:
+    # 배치마다 커밋하므로 중간에 끊겨도(예열 단계 시간 초과) 채운 만큼은 남고, 다시 시도하면 이어서 채운다.
+    # 빠진 품목은 잠금을 잡은 뒤에 다시 읽으므로 다른 워커가 방금 채운 품목을 또 넣지 않는다
+    after_id = 0
+    total = 0
+    while True:
+        await db.execute(select(func.pg_advisory_xact_lock(VERDICT_BACKFILL_LOCK_KEY)))
+        result = await db.execute(
+            select(ProhibitedItem.id)
+                .where(ProhibitedItem.id > after_id, ~exists().where(ItemVerdict.prohibited_item_id == ProhibitedItem.id))
+                .order_by(ProhibitedItem.id)
+                .limit(batch_size)
+        )
+        item_ids = result.scalars().all()
+        if item_ids:
+            await refresh_item_verdicts(db, item_ids)
+        await db.commit()
+        invalidate_item_responses(item_ids)
+        if not item_ids:
+            return total
+        total += len(item_ids)
+        after_id = item_ids[-1]
 
-async def create_suggestion(db: Session, suggestion: SuggestionCreate):
+def autocomplete_entries_query():
+    return select(ProhibitedItem.id, ProhibitedItem.item_name, Category.image)\
+        .outerjoin(Subcategory, ProhibitedItem.subcategory_id == Subcategory.id)\
+        .outerjoin(Category, Subcategory.category_id == Category.id)
+
+async def stream_autocomplete_entries(db: AsyncSession, batch_size: int = 10000):
+    # (id, 품목명, 분류 이미지)를 서버 측 커서로 나눠 읽는다. 트랜잭션 안에서 호출해야 한다
+    return await db.stream(autocomplete_entries_query().execution_options(yield_per=batch_size))
+
+async def stream_item_verdicts(db: AsyncSession, batch_size: int = 10000):
+    # 전체 판정을 품목 id 순으로 서버 측 커서로 나눠 읽는다. 트랜잭션 안에서 호출해야 한다
+    return await db.stream(
+        select(ItemVerdict.prohibited_item_id, ItemVerdict.scope, ItemVerdict.category, ItemVerdict.subcategory,
+               ItemVerdict.image_path, ItemVerdict.flight_option, ItemVerdict.cabin, ItemVerdict.trust)
+            .order_by(ItemVerdict.prohibited_item_id)
+            .execution_options(yield_per=batch_size)
+    )
+
+async def create_suggestion(db: AsyncSession, suggestion: SuggestionCreate):
     db_suggestion = Suggestion(**suggestion.model_dump())
     db.add(db_suggestion)
-    await asyncio.to_thread(db.commit)
-    await asyncio.to_thread(db.refresh, db_suggestion)
+    await db.commit()
+    await db.refresh(db_suggestion)
     return db_suggestion
 
-async def insert_subcategory(db: Session, subcategory: SubcategoryCreate):
+async def insert_subcategory(db: AsyncSession, subcategory: SubcategoryCreate):
     db_subcategory = Subcategory(**subcategory.model_dump())
     db.add(db_subcategory)
-    await asyncio.to_thread(db.commit)
-    await asyncio.to_thread(db.refresh, db_subcategory)
+    await db.flush()
+    await record_catalog_changes(db, CATALOG_SUBCATEGORY, [db_subcategory.id])
+    await db.commit()
+    await db.refresh(db_subcategory)
+    reference_cache.invalidate()
     return db_subcategory
 
-def get_top_search_histories(db: Session, limit: int) -> List[SearchHistory]:
-    return db.query(SearchHistory)\
-             .filter(SearchHistory.prohibited_item_id.isnot(None))\
-             .order_by(SearchHistory.search_count.desc())\
-             .limit(limit)\
-             .all()
-
-def get_categories(db: Session) -> List[Category]:
-    return db.query(Category)\
-            .all()
-
-def get_subcategories(db: Session) -> List[Subcategory]:
-    return db.query(Subcategory)\
-            .all()
-
-def get_flight_options(db: Session) -> List[FlightOption]:
-    return db.query(FlightOption)\
-            .all()
-
-def get_field_options(db: Session) -> List[FieldOption]:
-    return db.query(FieldOption)\
-            .all()
-    
-def create_prohibited_item_with_conditions(db: Session, item: ProhibitedItemCreate):
+async def get_top_search_histories(db: AsyncSession, limit: int) -> List[SearchHistory]:
+    result = await db.execute(
+        select(SearchHistory)
+            .where(SearchHistory.prohibited_item_id.isnot(None))
+            .order_by(SearchHistory.search_count.desc(), SearchHistory.search_term)
+            .limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_categories(db: AsyncSession) -> List[Category]:
+    result = await db.execute(select(Category))
+    return result.scalars().all()
+
+async def get_subcategories(db: AsyncSession, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Subcategory]:
+    statement = select(Subcategory).order_by(Subcategory.id)
+    if after_id is not None:
+        statement = statement.where(Subcategory.id > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    result = await db.execute(statement)
+    return result.scalars().all()
+
+async def get_flight_options(db: AsyncSession) -> List[FlightOption]:
+    result = await db.execute(select(FlightOption))
+    return result.scalars().all()
+
+async def get_field_options(db: AsyncSession) -> List[FieldOption]:
+    result = await db.execute(select(FieldOption))
+    return result.scalars().all()
+
+async def insert_prohibited_items(db: AsyncSession, items: List[ProhibitedItemCreate]) -> List[int]:
+    # 품목과 조건을 각각 multi-row INSERT 한 번으로 넣고 판정 테이블까지 채운다. commit은 호출한 쪽에서 한다
+    result = await db.execute(
+        insert(ProhibitedItem).returning(ProhibitedItem.id, sort_by_parameter_order=True),
+        [{"item_name": item.item_name, "image_path": item.image_path, "subcategory_id": item.subcategory_id}
+         for item in items]
+    )
+    item_ids = result.scalars().all()
+
+    condition_rows = [
+        {
+            "prohibited_item_id": item_id,
+            "flight_option_id": condition.flight_option_id,
+            "field_option_id": condition.field_option_id,
+            "condition": condition.condition,
+            "allowed": condition.allowed
+        }
+        for item_id, item in zip(item_ids, items)
+        for condition in item.conditions
+    ]
+    if condition_rows:
+        await db.execute(insert(Condition), condition_rows)
+
+    await refresh_item_verdicts(db, item_ids)
+    await record_catalog_changes(db, CATALOG_ITEM, item_ids)
+    return item_ids
+
+async def create_prohibited_item_with_conditions(db: AsyncSession, item: ProhibitedItemCreate):
     new_item = ProhibitedItem(
         item_name=item.item_name,
         image_path=item.image_path,
         subcategory_id=item.subcategory_id
     )
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
-    
+    await db.flush()
+
     for condition in item.conditions:
         db_condition = Condition(
             prohibited_item_id=new_item.id,
@@ -129,5 +304,91 @@ def create_prohibited_item_with_conditions(db: Session, item: ProhibitedItemCrea
             allowed=condition.allowed
         )
         db.add(db_condition)
-    
-    db.commit()
\ No newline at end of file
+
+    await db.flush()
+    await refresh_item_verdicts(db, [new_item.id])
+    await record_catalog_changes(db, CATALOG_ITEM, [new_item.id])
+    await db.commit()
+    invalidate_item_responses([new_item.id])
+    item_response_cache.invalidate_kind(SEARCH_CACHE_KIND)
+    # 품목 하나를 넣을 때마다 전체 인덱스를 다시 읽지 않고 새 항목만 덧붙인다
+    autocomplete_index.add(new_item.id, new_item.item_name, await get_subcategory_image(db, new_item.subcategory_id))
+    negative_cache.invalidate()
+    return new_item
+
+async def get_subcategory_image(db: AsyncSession, subcategory_id: int) -> Optional[str]:
+    result = await db.execute(
+        select(Category.image)
+            .join(Subcategory, Subcategory.category_id == Category.id)
+            .where(Subcategory.id == subcategory_id)
+    )
+    return result.scalar()
+
+# 카탈로그 변경 로그의 대상 종류와 변경 종류
+CATALOG_ITEM = "item"
+CATALOG_SUBCATEGORY = "subcategory"
+CHANGE_UPSERT = "upsert"
+CHANGE_BASELINE = "baseline"
+
+# 카탈로그 쓰기를 직렬화하는 advisory lock 키 (마이그레이션 키와 겹치지 않게)
+CATALOG_WRITE_LOCK_KEY = 7_240_417
+
+async def record_catalog_changes(db: AsyncSession, entity: str, entity_ids: List[int], change: str = CHANGE_UPSERT):
+    # 쓰기와 같은 트랜잭션에서 기록해야 변경분 동기화에서 빠지는 쓰기가 없다. commit은 호출한 쪽에서 한다.
+    # 커밋까지 잠금을 잡아 버전이 커밋 순서대로 매겨지게 한다. 그렇지 않으면 늦게 커밋된 낮은 버전을
+    # 이미 그 뒤 버전까지 동기화한 클라이언트가 놓친다
+    if entity_ids:
+        await db.execute(select(func.pg_advisory_xact_lock(CATALOG_WRITE_LOCK_KEY)))
+        replica_router.mark_write()
+        await db.execute(insert(CatalogChange),
+                         [{"entity": entity, "entity_id": entity_id, "change": change} for entity_id in entity_ids])
+
+async def get_catalog_version(db: AsyncSession) -> int:
+    return (await db.execute(select(func.coalesce(func.max(CatalogChange.version), 0)))).scalar()
+
+async def get_catalog_baseline(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(func.coalesce(func.max(CatalogChange.version), 0)).where(CatalogChange.change == CHANGE_BASELINE)
+    )
+    return result.scalar()
+
+async def get_catalog_changes(db: AsyncSession, since: int, limit: int) -> List[CatalogChange]:
+    result = await db.execute(
+        select(CatalogChange)
+            .where(CatalogChange.version > since)
+            .order_by(CatalogChange.version)
+            .limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_catalog_items(db: AsyncSession, after_id: Optional[int] = None, ids: Optional[List[int]] = None,
+                            limit: Optional[int] = None) -> List[ProhibitedItem]:
+    statement = select(ProhibitedItem.id, ProhibitedItem.item_name, ProhibitedItem.subcategory_id, ProhibitedItem.image_path)
+    if after_id is not None:
+        statement = statement.where(ProhibitedItem.id > after_id)
+    if ids is not None:
+        statement = statement.where(ProhibitedItem.id.in_(ids))
+    if limit is not None:
+        statement = statement.limit(limit)
+    result = await db.execute(statement.order_by(ProhibitedItem.id))
+    return result.all()
+
+async def get_subcategories_by_ids(db: AsyncSession, ids: List[int]) -> List[Subcategory]:
+    result = await db.execute(select(Subcategory).where(Subcategory.id.in_(ids)).order_by(Subcategory.id))
+    return result.scalars().all()
+
+async def get_conditions_for_items(db: AsyncSession, item_ids: List[int]) -> List[Condition]:
+    result = await db.execute(
+        select(Condition.prohibited_item_id, Condition.condition, Condition.allowed,
+               Condition.flight_option_id, Condition.field_option_id)
+            .where(Condition.prohibited_item_id.in_(item_ids))
+            .order_by(Condition.prohibited_item_id, Condition.id)
+    )
+    return result.all()
+
+async def get_verdicts_for_items(db: AsyncSession, item_ids: List[int]) -> List[ItemVerdict]:
+    result = await db.execute(
+        select(ItemVerdict.prohibited_item_id, ItemVerdict.scope, ItemVerdict.flight_option, ItemVerdict.cabin, ItemVerdict.trust)
+            .where(ItemVerdict.prohibited_item_id.in_(item_ids))
+    )
+    return result.all()
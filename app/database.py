@@ -1,50 +1,79 @@
-from sqlalchemy import create_engine, event, text
+import time
+from typing import List
+
+import orjson
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
 
 settings = get_settings()
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
 
-# 트리거를 사용하여 search_vector 업데이트 설정
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """커넥션을 얻기까지 기다린 시간과 타임아웃 횟수를 세는 풀.
 
-def create_trigger(conn):
-    # Check if the trigger already exists
-    trigger_exists_query = """
-        SELECT EXISTS (
-            SELECT 1 
-            FROM pg_trigger 
-            WHERE tgname = 'tsvectorupdate'
-        );
+    워커 수와 pool.size/max_overflow를 Postgres max_connections에 맞춰 조정할 때 /stats/pool로 본다.
     """
-    trigger_exists = conn.execute(text(trigger_exists_query)).scalar()
-
-    if not trigger_exists:
-        conn.execute(text("""
-            CREATE OR REPLACE FUNCTION update_search_vector() RETURNS trigger AS $$
-            BEGIN
-                NEW.search_vector :=
-                    to_tsvector('pg_catalog.english', coalesce(NEW.category, '') || ' ' ||
-                                coalesce(NEW.subcategory, '') || ' ' ||
-                                coalesce(NEW.item_name, '') || ' ' ||
-                                coalesce(NEW.description, ''));
-                RETURN NEW;
-            END
-            $$ LANGUAGE plpgsql;
-        """))
-
-        conn.execute(text("""
-            CREATE TRIGGER tsvectorupdate BEFORE INSERT OR UPDATE
-            ON prohibited_items FOR EACH ROW EXECUTE PROCEDURE update_search_vector();
-        """))
-
-        
-def init_db():
-    Base.metadata.create_all(bind=engine)
-    with engine.connect() as conn:
-        create_trigger(conn)
\ No newline at end of file
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            # QueuePool.overflow()는 풀이 다 차기 전까지 음수이므로 실제로 넘친 커넥션 수만 보인다
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_time_total": round(self.wait_time, 6),
+            "wait_time_avg": round(self.wait_time / self.checkouts, 6) if self.checkouts else 0.0,
+            "wait_time_max": round(self.max_wait_time, 6)
+        }
+
+
+def make_engine(url: str) -> AsyncEngine:
+    # statement_timeout(ms)은 연결마다 서버 설정으로 건다. 0이면 제한하지 않는다
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.pool_max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args={"server_settings": {"statement_timeout": str(settings.pool_statement_timeout)}},
+        # 판정 테이블의 JSONB(cabin/trust)를 읽을 때마다 표준 json 대신 orjson으로 디코딩한다
+        json_deserializer=orjson.loads
+    )
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+# 읽기 전용 복제본. 어떤 세션을 쓸지는 app.replicas의 replica_router가 정한다
+replica_engines: List[AsyncEngine] = [make_engine(url) for url in settings.replica_urls]
+Base = declarative_base()
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import orjson
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.autocomplete import DEFAULT_LIMIT, autocomplete_index
+from app.cache import negative_cache, search_miss_key
+from app.crud import search_prohibited_items_ranked
+from app.database import settings
+from app.replicas import replica_router
+from app.schemas import SearchMode
+from app.search_history import search_history_aggregator
+from app.snapshot import shared_catalog
+
+logger = logging.getLogger(__name__)
+
+MAX_LIMIT = 100
+MAX_TERM_LENGTH = 100
+
+
+class TokenBucket:
+    """연결 하나의 조회 빈도 제한. 초당 rate개씩 채워지고 최대 burst개까지 모인다."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LiveSearch:
+    """입력 중인 검색어를 WebSocket 하나로 받아 자동완성 결과를 돌려주는 채널.
+
+    사용자 세션마다 연결을 하나 유지하므로 글자마다 HTTP 요청(CORS, rate limit, 의존성 주입)을 반복하지 않는다.
+    새 검색어가 오면 아직 끝나지 않은 이전 조회는 취소하고, 검색 기록은 중간 입력이 아니라
+    클라이언트가 commit으로 확정한 검색어만 남긴다.
+
+    HTTP의 rate limit을 거치지 않으므로 연결마다 TokenBucket으로 조회 빈도를 제한한다. 취소해도
+    이미 DB에서 실행 중인 쿼리는 끝까지 돌기 때문에, ranked 조회가 진행 중이면 취소하지 않고 끝나기를 기다린다.
+
+    메시지 (JSON)
+      -> {"type": "query", "seq": 3, "term": "보조", "limit": 20, "mode": "basic"}
+      <- {"type": "results", "seq": 3, "term": "보조", "items": [...]}
+      -> {"type": "commit", "term": "보조배터리", "item_id": 12}
+      <- {"type": "error", "seq": 3, "message": "..."}
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.connections = 0
+        self.queries = 0
+        self.superseded = 0
+        self.throttled = 0
+        self.commits = 0
+
+    async def _search(self, term: str, limit: int, mode: SearchMode) -> list:
+        # /items/와 같은 조회이므로 미스 기록도 함께 쓴다
+        miss_key = search_miss_key("items", term, mode)
+        if miss_key in negative_cache:
+            return []
+        version = negative_cache.version
+        if mode == SearchMode.ranked:
+            async with replica_router.session() as db:
+                items = [row._asdict() for row in await search_prohibited_items_ranked(db, query=term, limit=limit)]
+        else:
+            items = autocomplete_index.search(term, limit=limit)
+        if not items:
+            negative_cache.add(miss_key, version)
+        return items
+
+    async def _send(self, websocket: WebSocket, message: dict):
+        # 전송 도중 취소되면 프레임이 끊기므로, 조회는 취소해도 보내기 시작한 응답은 끝까지 보낸다
+        await asyncio.shield(websocket.send_text(orjson.dumps(message).decode()))
+
+    async def _query(self, websocket: WebSocket, seq, term: str, limit: int, mode: SearchMode):
+        try:
+            items = await self._search(term, limit, mode)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("live search failed for term=%r", term)
+            response = {"type": "error", "seq": seq, "message": "Search failed"}
+        else:
+            response = {"type": "results", "seq": seq, "term": term, "items": items}
+        try:
+            await self._send(websocket, response)
+        except (WebSocketDisconnect, RuntimeError):
+            # 조회하는 동안 연결이 닫혔다
+            pass
+
+    def _commit(self, message: dict):
+        term = message.get("term")
+        item_id = message.get("item_id")
+        if not isinstance(term, str) or not term or len(term) > MAX_TERM_LENGTH:
+            return "Invalid term"
+        if item_id is not None and (isinstance(item_id, bool) or not isinstance(item_id, int)):
+            return "Invalid item_id"
+        # 검색 기록은 품목을 외래 키로 참조하므로, 카탈로그에 없는 id를 남기면 flush가 계속 실패한다.
+        # 스냅샷에 없는 id(스냅샷 이후 추가된 품목 포함)는 검색어만 남긴다
+        if item_id is not None and not shared_catalog.has_item(item_id):
+            item_id = None
+        self.commits += 1
+        search_history_aggregator.record(search_term=term, prohibited_item_id=item_id)
+        return None
+
+    def _parse_query(self, message: dict):
+        term = message.get("term")
+        limit = message.get("limit", DEFAULT_LIMIT)
+        if not isinstance(term, str) or len(term) > MAX_TERM_LENGTH:
+            return "Invalid term"
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_LIMIT:
+            return "Invalid limit"
+        try:
+            mode = SearchMode(message.get("mode", SearchMode.basic))
+        except ValueError:
+            return "Invalid mode"
+        return term, limit, mode
+
+    async def serve(self, websocket: WebSocket):
+        await websocket.accept()
+        self.connections += 1
+        task: Optional[asyncio.Task] = None
+        task_mode: Optional[SearchMode] = None
+        bucket = TokenBucket(self.rate, self.burst)
+        try:
+            while True:
+                raw = await websocket.receive()
+                if raw["type"] == "websocket.disconnect":
+                    break
+                try:
+                    message = orjson.loads(raw.get("text") or raw.get("bytes") or b"")
+                except orjson.JSONDecodeError:
+                    message = None
+                if not isinstance(message, dict):
+                    await self._send(websocket, {"type": "error", "seq": None, "message": "Invalid message"})
+                    continue
+
+                seq = message.get("seq")
+                if message.get("type") == "commit":
+                    error = self._commit(message)
+                elif message.get("type") == "query":
+                    parsed = self._parse_query(message)
+                    error = parsed if isinstance(parsed, str) else None
+                    if error is None and not bucket.take():
+                        self.throttled += 1
+                        error = "Rate limit exceeded"
+                    if error is None:
+                        if task is not None and not task.done():
+                            if task_mode == SearchMode.ranked:
+                                # 취소해도 DB의 쿼리는 멈추지 않으므로 연결당 한 번에 하나만 돌린다
+                                await asyncio.wait([task])
+                            else:
+                                # 더 새로운 입력이 왔으니 이전 조회 결과는 필요 없다
+                                task.cancel()
+                                self.superseded += 1
+                        self.queries += 1
+                        task_mode = parsed[2]
+                        task = asyncio.get_running_loop().create_task(self._query(websocket, seq, *parsed))
+                else:
+                    error = "Unknown message type"
+                if error is not None:
+                    await self._send(websocket, {"type": "error", "seq": seq, "message": error})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.connections -= 1
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, WebSocketDisconnect):
+                    pass
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "queries": self.queries, "superseded": self.superseded,
+                "throttled": self.throttled, "commits": self.commits}
+
+
+live_search = LiveSearch(settings.rate_limit_live_search_rate, settings.rate_limit_live_search_burst)
@@ -1,6 +1,8 @@
-from fastapi import FastAPI, Depends, Path, Request, Query, Form
-from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, Depends, HTTPException, Path, Request, Query, Form, WebSocket
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import JSONResponse, HTMLResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+import orjson
 
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -8,31 +10,78 @@ from slowapi.util import get_remote_address
 
 from app.schemas import (
     SearchHistoryResponse, SubcategoryCreate, SearchResponse,
-    ProhibitedItemBase, ItemNotFound, Suggestion, ProhibitedItemList,
+    ItemNotFound, Suggestion, ProhibitedItemList,
     SuggestionCreate, Subcategory, ProhibitedItemCreate, ConditionCreate,
-    ProhibitedItemCondition, Category, FieldOption, FlightOption
+    ProhibitedItemCondition, Category, FieldOption, FlightOption, SearchMode,
+    ImportFormat, ImportResult, VerdictBatchRequest, VerdictBatchResponse, TrendingWindow
 )
 from app.crud import (
-    get_item_conditions, create_prohibited_item_with_conditions, 
-    get_top_search_histories, get_prohibited_item_by_id, get_condition_by_name, 
-    create_search_history, search_prohibited_items, create_suggestion, 
+    get_item_verdict, get_item_verdicts, create_prohibited_item_with_conditions, 
+    create_suggestion, 
     insert_subcategory, get_categories, get_field_options, get_flight_options, 
-    get_subcategories
+    search_prohibited_items_ranked, get_catalog_baseline, get_catalog_version
+)
+from app.autocomplete import autocomplete_index
+from app.live_search import live_search
+from app.search_history import search_history_aggregator
+from app.trending import trending_searches
+from app.verdicts import get_scope, verdict_to_dict
+from app.bulk_import import import_items, DEFAULT_CHUNK_SIZE
+from app.cache import (
+    reference_cache, item_response_cache, negative_cache, etag_response, search_miss_key, CachedItemResponse, NEXT_CURSOR_HEADER,
+    SEARCH_CACHE_KIND
+)
+from app.metrics import MetricsMiddleware, registry
+from app.profiling import profiler
+from app.static_pages import StaticPages
+from app.catalog import (
+    DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT, NDJSON_MEDIA_TYPE, stream_changes, stream_export
+)
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    decode_cursor, encode_cursor, get_subcategory_page, page_response
 )
 
-from app.database import SessionLocal, init_db
+from app.replicas import replica_router
+from app.snapshot import shared_catalog
+from app.warmup import warmup
+from app.database import SessionLocal, engine, settings
+import app.ratelimit  # noqa: F401  sqlite:// 저장소 스킴 등록
 
 from fastapi.staticfiles import StaticFiles
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
+from contextlib import asynccontextmanager
 from typing import Optional, Union, List
 
-init_db()
-
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/day"])
-
-app = FastAPI(swagger_ui_parameters={"syntaxHighlight.theme": "obsidian"})
+limiter = Limiter(key_func=get_remote_address, default_limits=["100/day"], storage_uri=settings.rate_limit_storage_uri)
+
+STATIC_PAGES = ("form.html", "subcategory_form.html")
+static_pages = StaticPages("static", settings.static_max_age)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 스키마는 배포 때 python -m app.migrations로 한 번만 적용한다. 기동은 DB를 기다리지 않고,
+    # 캐시/인덱스 예열은 백그라운드에서 진행되며 끝나기 전까지 /health/ready가 503을 반환한다
+    for page in STATIC_PAGES:
+        static_pages.load(page)
+    search_history_aggregator.start()
+    replica_router.start()
+    trending_searches.start()
+    warmup.start()
+    shared_catalog.start()
+    yield
+    await shared_catalog.stop()
+    await warmup.stop()
+    await trending_searches.stop()
+    await search_history_aggregator.stop()
+    await replica_router.stop()
+
+# 응답은 orjson으로 한 번만 인코딩한다. 자주 쓰는 엔드포인트는 검증을 거치지 않고 dict/bytes를 바로 응답한다
+app = FastAPI(swagger_ui_parameters={"syntaxHighlight.theme": "obsidian"}, lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -47,25 +96,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", NEXT_CURSOR_HEADER],
 )
+# 일정 크기 이상의 JSON 응답은 Accept-Encoding에 따라 gzip으로 압축한다 (이미 압축된 정적 페이지는 그대로 통과)
+app.add_middleware(GZipMiddleware, minimum_size=settings.compression_minimum_size, compresslevel=settings.compression_level)
+app.add_middleware(MetricsMiddleware)
+
+SEARCH_HISTORY = "search_history"
 
-def get_db():
-    db = SessionLocal()
-    try:
+def message_response(message: str, status_code: int) -> ORJSONResponse:
+    # ItemNotFound 형식의 오류 응답
+    return ORJSONResponse(content={"message": message}, status_code=status_code)
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+async def get_read_db():
+    # 읽기 전용 엔드포인트용. 건강한 복제본이 없으면 프라이머리 세션을 받는다
+    async with replica_router.session() as db:
+        try:
+            yield db
+        except DBAPIError as e:
+            if e.connection_invalidated:
+                replica_router.mark_failed(db.bind)
+            raise
 
 @app.get("/", response_class=HTMLResponse)
-async def get_form():
-    with open("static/form.html") as f:
-        return HTMLResponse(content=f.read())
+async def get_form(request: Request):
+    return static_pages.response(request, "form.html")
 
 @app.get("/create_subcategory/", response_class=HTMLResponse)
-async def get_subcategory_form():
-    with open("static/subcategory_form.html") as f:
-        return HTMLResponse(content=f.read())
+async def get_subcategory_form(request: Request):
+    return static_pages.response(request, "subcategory_form.html")
 
 @app.get("/items/",
          response_model=Union[ProhibitedItemList, ItemNotFound],
@@ -74,28 +137,42 @@ async def get_subcategory_form():
          status_code=200)
 async def search_items(
     search_term: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: int = Query(20, description="반환할 최대 품목 수", ge=1, le=100),
+    mode: SearchMode = Query(SearchMode.basic, description="basic: 자동완성 인덱스, ranked: 전문검색+유사도 순위 검색"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     if search_term is None:
-        return JSONResponse(content=ItemNotFound(message="Search term is required").model_dump(),
-                            status_code=400,
-                            media_type="application/json")
-
-    items = search_prohibited_items(db, query=search_term)
+        return message_response("Search term is required", 400)
+
+    # 최근에 결과가 없었던 검색어는 인덱스/DB를 다시 훑지 않는다
+    miss_key = search_miss_key("items", search_term, mode)
+    if miss_key in negative_cache:
+        items = []
+    else:
+        version = negative_cache.version
+        if mode == SearchMode.ranked:
+            items = [row._asdict() for row in await search_prohibited_items_ranked(db, query=search_term, limit=limit)]
+        else:
+            items = autocomplete_index.search(search_term, limit=limit)
+        if not items:
+            negative_cache.add(miss_key, version)
     if not items:
-        await create_search_history(db, search_term=search_term)
-        return JSONResponse(content=ItemNotFound(message=f"No items found for search term: {search_term}").model_dump(),
-                            status_code=404,
-                            media_type="application/json")
-
-    await create_search_history(db, search_term=search_term)
-    return ProhibitedItemList(
-        items=[ProhibitedItemBase(
-            id=item.id,
-            item_name=item.item_name,
-            category_image=item.subcategory.category.image
-        ) for item in items]
-    )
+        search_history_aggregator.record(search_term=search_term)
+        return message_response(f"No items found for search term: {search_term}", 404)
+
+    search_history_aggregator.record(search_term=search_term)
+    # 자동완성 인덱스와 순위 검색 결과는 이미 ProhibitedItemBase 형식(id, item_name, category_image)이다
+    return ORJSONResponse(content={"items": items})
+
+@app.websocket("/ws/items/")
+async def search_items_live(websocket: WebSocket):
+    # 입력할 때마다 /items/를 호출하는 대신 연결 하나로 자동완성을 주고받는다 (메시지 형식은 app/live_search.py).
+    # WebSocket에는 CORS가 적용되지 않으므로 브라우저가 보낸 Origin을 같은 허용 목록으로 직접 확인한다
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in origins:
+        await websocket.close(code=1008)
+        return
+    await live_search.serve(websocket)
 
 @app.post("/subcategories/{subcategory_id}/items/")
 async def create_item_with_conditions(
@@ -103,7 +180,7 @@ async def create_item_with_conditions(
     subcategory_id: int = Path(...),
     item_name: str = Form(...),
     image_path: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     form = await request.form()
     conditions = []
@@ -135,6 +212,22 @@ async def create_item_with_conditions(
 
     return {"message": "Item with conditions created successfully"}
 
+@app.post("/items/import/",
+          response_model=ImportResult,
+          summary="CSV/JSONL로 품목과 조건을 일괄 등록하는 API",
+          description="요청 본문을 스트리밍으로 읽어 청크 단위 트랜잭션으로 등록하고 행별 오류를 반환합니다.")
+async def import_prohibited_items(
+    request: Request,
+    format: ImportFormat = Query(..., description="csv: 조건 한 건당 한 행, jsonl: 품목 한 건당 한 줄"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, description="한 트랜잭션에 넣을 품목 수", ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await import_items(db, request.stream(), format, chunk_size)
+    if result.imported:
+        # 가져온 품목이 자동완성에 바로 보이도록 스냅샷 갱신을 앞당긴다
+        shared_catalog.trigger()
+    return result
+
 @app.get("/items/{item_id}/", 
          response_model=Union[ProhibitedItemCondition, ItemNotFound],
          status_code=200,
@@ -145,47 +238,29 @@ async def get_item_by_id(
     item_id: int = Path(..., description="The ID of the item to retrieve"),
     is_international: Optional[bool] = Query(None),
     is_domestic: Optional[bool] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    item = get_prohibited_item_by_id(db=db, id=item_id)
+    scope = get_scope(is_international, is_domestic)
+    cache_key = ("id", item_id, scope)
+    cached = item_response_cache.get(cache_key)
+    if cached is not None:
+        search_history_aggregator.record(search_term=cached.item_name, prohibited_item_id=cached.item_id)
+        return Response(content=cached.body, media_type="application/json")
+
+    # 공유 스냅샷에 없는 품목(스냅샷 이후 추가)만 DB에서 읽는다
+    item = shared_catalog.verdict(scope, id=item_id)
     if item is None:
-        await create_search_history(db, search_term=f"id: {item_id}")
-        return JSONResponse(content=ItemNotFound(message=f"id : {item_id} is not found").model_dump(), 
-                            status_code=404, 
-                            media_type="application/json")
-    
-    await create_search_history(db, search_term=item.item_name, prohibited_item_id=item.id)
-
-    # 조건을 조회
-    conditions = get_item_conditions(db, item.id, is_international, is_domestic)
-
-    cabin_conditions = [condition.condition for condition in conditions if condition.field_option.option == "cabin"]
-    trust_conditions = [condition.condition for condition in conditions if condition.field_option.option == "trust"]
+        verdict = await get_item_verdict(db, scope, id=item_id)
+        if verdict is None:
+            search_history_aggregator.record(search_term=f"id: {item_id}")
+            return message_response(f"id : {item_id} is not found", 404)
+        item = verdict_to_dict(verdict)
     
-    cabin_allowed = [condition.allowed for condition in conditions if condition.field_option.option == "cabin"]
-    trust_allowed = [condition.allowed for condition in conditions if condition.field_option.option == "trust"]
-
-    cabin_status = '△' if True in cabin_allowed and False in cabin_allowed else ('O' if all(c == True for c in cabin_allowed) else 'X')
-    trust_status = '△' if True in trust_allowed and False in trust_allowed else ('O' if all(c == True for c in trust_allowed) else 'X')
-
-    result = {
-        "id": item.id,
-        "category": item.subcategory.category.name,
-        "subcategory": item.subcategory.name,
-        "item_name": item.item_name,
-        "image_path": item.image_path,
-        "flight_option": conditions[0].flight_option.option if conditions else None,
-        "cabin": {
-            "availability": cabin_status,
-            "condition_description": cabin_conditions
-        },
-        "trust": {
-            "availability": trust_status,
-            "condition_description": trust_conditions
-        }
-    }
+    search_history_aggregator.record(search_term=item["item_name"], prohibited_item_id=item["id"])
 
-    return result
+    body = orjson.dumps(item)
+    item_response_cache.set(cache_key, CachedItemResponse(body, item["id"], item["item_name"]), item["id"])
+    return Response(content=body, media_type="application/json")
 
 @app.get("/items/search/conditions/", 
          response_model=Union[SearchResponse, ItemNotFound],
@@ -197,46 +272,70 @@ async def get_item_by_search_term(
     search_term: Optional[str] = Query(None),
     is_international: Optional[bool] = Query(None),
     is_domestic: Optional[bool] = Query(None),
-    db: Session = Depends(get_db)
+    mode: SearchMode = Query(SearchMode.basic, description="ranked: 정확히 일치하는 품목이 없으면 가장 유사한 품목으로 대체"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    item = get_condition_by_name(db=db, name=search_term)
-    if not item:
-        await create_search_history(db, search_term=search_term)
-        return JSONResponse(content=ItemNotFound(message=f"Item : {search_term} is not found").model_dump(), 
-                            status_code=404, 
-                            media_type="application/json")
-    
+    scope = get_scope(is_international, is_domestic)
+    cache_key = (SEARCH_CACHE_KIND, search_term, scope, mode)
+    cached = item_response_cache.get(cache_key)
+    if cached is not None:
+        search_history_aggregator.record(search_term=search_term, prohibited_item_id=cached.item_id)
+        return Response(content=cached.body, media_type="application/json")
+
+    # 판정은 모든 항공편 범위에 대해 함께 저장되므로 미스는 범위와 관계없이 기억한다
+    miss_key = search_miss_key("conditions", search_term or "", mode)
+    item = shared_catalog.verdict(scope, name=search_term)
+    if item is None and miss_key not in negative_cache:
+        version = negative_cache.version
+        verdict = await get_item_verdict(db, scope, name=search_term)
+        if not verdict and mode == SearchMode.ranked and search_term:
+            ranked = await search_prohibited_items_ranked(db, query=search_term, limit=1)
+            if ranked:
+                verdict = await get_item_verdict(db, scope, id=ranked[0].id)
+        item = verdict_to_dict(verdict) if verdict else None
+        if item is None:
+            negative_cache.add(miss_key, version)
+    if item is None:
+        search_history_aggregator.record(search_term=search_term)
+        return message_response(f"Item : {search_term} is not found", 404)
     
-    await create_search_history(db, search_term=search_term, prohibited_item_id=item.id)
-    conditions = get_item_conditions(db=db, prohibited_item_id=item.id, is_domestic=is_domestic, is_international=is_international )
-
-    cabin_conditions = [condition.condition for condition in conditions if condition.field_option.option == "cabin"]
-    trust_conditions = [condition.condition for condition in conditions if condition.field_option.option == "trust"]
-        
-    cabin_allowed = [condition.allowed for condition in conditions if condition.field_option.option == "cabin"]
-    trust_allowed = [condition.allowed for condition in conditions if condition.field_option.option == "trust"]
-
-    cabin_status = '△' if True in cabin_allowed and False in cabin_allowed else ('O' if all(c == True for c in cabin_allowed) else 'X')
-    trust_status = '△' if True in trust_allowed and False in trust_allowed else ('O' if all(c == True for c in trust_allowed) else 'X')
     
-    item_dict = {
-            "id": item.id,
-            "category": item.subcategory.category.name,
-            "subcategory": item.subcategory.name,
-            "item_name": item.item_name,
-            "image_path": item.image_path,
-            "flight_option": conditions[0].flight_option.option,
-            "cabin": {
-                "availability": cabin_status,
-                "condition_description": cabin_conditions
-            },
-            "trust": {
-                "availability": trust_status,
-                "condition_description": trust_conditions
-            }
-        }
+    search_history_aggregator.record(search_term=search_term, prohibited_item_id=item["id"])
     
-    return SearchResponse(search_term=search_term, items=[item_dict])
+    body = orjson.dumps({"search_term": search_term, "items": [item]})
+    item_response_cache.set(cache_key, CachedItemResponse(body, item["id"], item["item_name"]), item["id"])
+    return Response(content=body, media_type="application/json")
+
+@app.post("/items/verdicts/",
+          response_model=VerdictBatchResponse,
+          status_code=200,
+          summary="여러 품목의 반입 조건을 한 번에 조회하는 API",
+          description="짐 목록처럼 여러 품목 id/이름을 받아 항공편 조건에 맞는 판정을 한 번의 조회로 반환합니다.")
+async def get_item_verdicts_batch(
+    batch: VerdictBatchRequest,
+    db: AsyncSession = Depends(get_read_db)
+):
+    verdicts = await get_item_verdicts(db, get_scope(batch.is_international, batch.is_domestic),
+                                       ids=batch.item_ids, names=batch.item_names)
+
+    by_id = {verdict.prohibited_item_id: verdict for verdict in verdicts}
+    by_name = {}
+    for verdict in verdicts:
+        by_name.setdefault(verdict.item_name, verdict)
+
+    items, not_found_ids, not_found_names = [], [], []
+    for item_id in batch.item_ids:
+        if item_id in by_id:
+            items.append(verdict_to_dict(by_id[item_id]))
+        else:
+            not_found_ids.append(item_id)
+    for item_name in batch.item_names:
+        if item_name in by_name:
+            items.append(verdict_to_dict(by_name[item_name]))
+        else:
+            not_found_names.append(item_name)
+
+    return ORJSONResponse(content={"items": items, "not_found_ids": not_found_ids, "not_found_names": not_found_names})
 
 @app.post("/suggestions/", 
           response_model=Suggestion,
@@ -247,7 +346,7 @@ async def get_item_by_search_term(
 async def create_user_suggestion(
     request: Request,
     suggestion: SuggestionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     new_suggestion = await create_suggestion(db=db, suggestion=suggestion)
     validated_suggestion = Suggestion.model_validate(new_suggestion)
@@ -261,7 +360,7 @@ async def create_user_suggestion(
 async def create_subcategory(
     subcategory: SubcategoryCreate,
     category_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     new_subcategory = await insert_subcategory(db=db, subcategory=subcategory, category_id=category_id)
     return new_subcategory
@@ -269,44 +368,130 @@ async def create_subcategory(
 @app.get("/search_history", 
          response_model=List[SearchHistoryResponse], 
          summary="검색 기록을 횟수 순으로 반환하는 API",
-         description="ID가 있는 검색 기록 중 검색 횟수가 많은 순서대로 입력받은 수 만큼 반환합니다.",
+         description="ID가 있는 검색 기록 중 최근 24시간/7일/전체 기간 검색 횟수가 많은 순서대로 입력받은 수 만큼 반환합니다.",
          status_code=200)
 async def get_search_history(
-    limit: int = Query(10, description="출력할 검색어 수", ge=1),
-    db: Session = Depends(get_db)
+    limit: int = Query(10, description="출력할 검색어 수", ge=1, le=100),
+    window: TrendingWindow = Query(TrendingWindow.all_time, description="집계 구간 (24h, 7d, all)"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 헤더 값")
 ):
-    search_histories = get_top_search_histories(db=db, limit=limit)
-    return [SearchHistoryResponse(
-        search_term=history.search_term,
-        prohibited_item_id=history.prohibited_item_id
-    ) for history in search_histories]
+    after = None
+    if cursor:
+        cursor_window, search_count, search_term = decode_cursor(SEARCH_HISTORY, cursor, (str, int, str))
+        if cursor_window != window.value:
+            raise HTTPException(status_code=400, detail="Cursor does not match window")
+        after = (search_count, search_term)
+
+    body, last = trending_searches.page(window, limit, after)
+    next_cursor = encode_cursor(SEARCH_HISTORY, window.value, last.search_count, last.search_term) if last else None
+    return page_response(body, next_cursor)
 
 @app.post("/subcategories/")
 async def create_subcategory(
     subcategory: SubcategoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
     await insert_subcategory(db, subcategory=subcategory)
 
     return {"message": "성공적으로 생성되었습니다"}
 
+@app.get("/catalog/version",
+         summary="현재 카탈로그 버전을 반환하는 API",
+         description="품목/소분류가 바뀔 때마다 증가하는 버전입니다. 클라이언트가 가진 버전과 같으면 동기화할 것이 없습니다.")
+async def read_catalog_version(db: AsyncSession = Depends(get_db)):
+    return {"version": await get_catalog_version(db)}
+
+@app.get("/catalog/export",
+         response_class=StreamingResponse,
+         summary="전체 카탈로그를 NDJSON으로 내보내는 API",
+         description="header(version) 줄 다음에 카테고리, 소분류, 항공편/필드 옵션, 품목(조건과 범위별 판정 포함)을 한 줄에 하나씩 보냅니다.")
+async def export_catalog():
+    return StreamingResponse(stream_export(), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/catalog/changes",
+         response_class=StreamingResponse,
+         summary="since 버전 이후 바뀐 카탈로그를 NDJSON으로 반환하는 API",
+         description="바뀐 품목/소분류의 현재 상태와 삭제된 대상을 보냅니다. header의 more가 true면 version으로 다시 요청합니다. "
+                     "변경 기록 이전 버전이면 410을 반환하며, 이때는 /catalog/export부터 다시 받습니다.")
+async def read_catalog_changes(
+    since: int = Query(..., ge=0, description="클라이언트가 가진 카탈로그 버전"),
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT, description="한 번에 읽을 변경 기록 수"),
+    db: AsyncSession = Depends(get_db)
+):
+    if since < await get_catalog_baseline(db) or since > await get_catalog_version(db):
+        raise HTTPException(status_code=410, detail="Catalog version is no longer available, export again")
+    return StreamingResponse(stream_changes(since, limit), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/stats/cache",
+         summary="캐시 적중/미스/축출 통계를 반환하는 API",
+         description="품목 상세 응답 캐시, 참조 데이터 캐시, 검색 미스 캐시의 크기 산정용 카운터, 공유 카탈로그 스냅샷 버전을 반환합니다.")
+async def get_cache_stats():
+    return {
+        "items": item_response_cache.stats(),
+        "reference": reference_cache.stats(),
+        "negative": negative_cache.stats(),
+        "snapshot": shared_catalog.stats()
+    }
+
+@app.get("/health/live",
+         summary="프로세스 생존 여부를 반환하는 API",
+         description="DB 상태와 관계없이 프로세스가 요청을 받을 수 있으면 200을 반환합니다.")
+async def health_live():
+    return {"status": "ok"}
+
+@app.get("/health/ready",
+         summary="트래픽을 받을 준비가 됐는지 반환하는 API",
+         description="기동 후 캐시/인덱스 예열이 모두 끝났으면 200, 아니면 503과 단계별 진행 상황을 반환합니다.")
+async def health_ready():
+    return JSONResponse(status_code=200 if warmup.ready else 503, content=warmup.report())
+
+@app.get("/stats/pool",
+         summary="DB 커넥션 풀 상태를 반환하는 API",
+         description="현재 워커의 체크아웃/오버플로 커넥션 수와 커넥션 대기 시간, 타임아웃 횟수를 반환합니다.")
+async def get_pool_stats():
+    return engine.pool.stats()
+
+@app.get("/stats/replicas",
+         summary="읽기 복제본 상태를 반환하는 API",
+         description="복제본별 복제 지연과 사용 가능 여부, 읽기 요청 수를 반환합니다. 사용 가능한 복제본이 없으면 읽기는 프라이머리로 갑니다.")
+async def get_replica_stats():
+    return replica_router.stats()
+
+@app.get("/stats/slow_queries",
+         summary="최근 느린 쿼리를 반환하는 API",
+         description="profiling.enabled일 때 slow_query_ms를 넘은 최근 쿼리의 요청 경로, 바인딩 값, 샘플링된 실행 계획을 반환합니다.")
+async def get_slow_queries():
+    return profiler.stats()
+
+@app.get("/metrics",
+         response_class=PlainTextResponse,
+         summary="Prometheus 형식 지표를 반환하는 API",
+         description="라우트별 지연 시간/상태 코드/DB 쿼리 수와 캐시, 커넥션 풀, 검색 기록 반영 카운터를 반환합니다.")
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/categories/", response_model=List[Category])
-async def read_categories(db: Session = Depends(get_db)):
-    categories = get_categories(db)
-    return categories
+async def read_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    payload = await reference_cache.get("categories", Category, lambda: get_categories(db))
+    return etag_response(request, payload)
 
-@app.get("/subcategories/", response_model=List[Subcategory])
-async def read_subcategories(db: Session = Depends(get_db)):
-    subcategories = get_subcategories(db)
-    return subcategories
+@app.get("/subcategories/", response_model=List[Subcategory],
+         description="id 순으로 limit개씩 반환합니다. 다음 페이지가 있으면 X-Next-Cursor 헤더 값을 cursor로 넘깁니다.")
+async def read_subcategories(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 헤더 값"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return etag_response(request, await get_subcategory_page(db, limit, cursor))
 
 @app.get("/flight_options/", response_model=List[FlightOption])
-async def read_flight_options(db: Session = Depends(get_db)):
-    flight_options = get_flight_options(db)
-    return flight_options
+async def read_flight_options(request: Request, db: AsyncSession = Depends(get_read_db)):
+    payload = await reference_cache.get("flight_options", FlightOption, lambda: get_flight_options(db))
+    return etag_response(request, payload)
 
 @app.get("/field_options/", response_model=List[FieldOption])
-async def read_field_options(db: Session = Depends(get_db)):
-    field_options = get_field_options(db)
-    return field_options
\ No newline at end of file
+async def read_field_options(request: Request, db: AsyncSession = Depends(get_read_db)):
+    payload = await reference_cache.get("field_options", FieldOption, lambda: get_field_options(db))
+    return etag_response(request, payload)
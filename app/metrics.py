@@ -0,0 +1,278 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.cache import item_response_cache, negative_cache, reference_cache
+from app.database import engine
+from app.live_search import live_search
+from app.replicas import replica_router
+from app.search_history import search_history_aggregator
+
+# 요청 하나가 실행한 쿼리 수와 DB 시간([쿼리 수, 초]). 요청 밖(백그라운드 작업)의 쿼리는 세지 않는다
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+# 처리 중인 요청의 ASGI scope. 라우팅이 끝나면 scope["route"]가 채워진다
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """누적 버킷 히스토그램. 관측은 이벤트 루프 스레드에서만 하므로 잠금 없이 센다."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [버킷별 개수..., 합계, 전체 개수]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(counts[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {counts[-1]}"
+
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식으로 내보내는 지표 모음.
+
+    요청 지표는 미들웨어가 직접 기록하고, 캐시/풀/검색 기록 버퍼처럼 이미 자체 카운터가 있는 객체는
+    수집 시점에 collector 함수로 (이름, 종류, 설명, [(라벨, 값)])을 읽어 온다.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                                 else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status code.", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "DB queries executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent in DB queries per HTTP request.", ("method", "route"))
+
+
+def route_template(scope) -> str:
+    # 원래 경로 대신 등록된 경로 템플릿(/items/{item_id}/)으로 묶어 라벨 수가 늘지 않게 한다
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # /static 같은 Mount 하위 경로
+        return scope.get("root_path", "") + "/{path}"
+    return "unmatched"
+
+
+def current_route() -> Optional[str]:
+    # 쿼리 로그 등에서 지금 요청을 "GET /items/{item_id}/" 형태로 구분한다. 요청 밖이면 None
+    scope = _request_scope.get()
+    return f"{scope['method']} {route_template(scope)}" if scope is not None else None
+
+
+class MetricsMiddleware:
+    """요청마다 지연 시간, 상태 코드, DB 쿼리 수/시간을 기록하는 ASGI 미들웨어."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        scope_token = _request_scope.set(scope)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            _request_scope.reset(scope_token)
+            labels = (scope["method"], route_template(scope))
+            http_requests.inc(labels + (status,))
+            http_request_duration.observe(elapsed, labels)
+            http_request_db_queries.observe(db[0], labels)
+            http_request_db_duration.observe(db[1], labels)
+
+
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _request_db.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        db = _request_db.get()
+        if db is not None and conn.info.get("query_started"):
+            db[0] += 1
+            db[1] += time.perf_counter() - conn.info["query_started"].pop()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        db = _request_db.get()
+        connection = exception_context.connection
+        if db is not None and connection is not None and connection.info.get("query_started"):
+            db[0] += 1
+            db[1] += time.perf_counter() - connection.info["query_started"].pop()
+
+
+def collect_cache_stats():
+    items = item_response_cache.stats()
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        yield f"item_cache_{key}_total", "counter", f"Item response cache {key}.", [({}, items[key])]
+    yield "item_cache_size", "gauge", "Entries in the item response cache.", [({}, items["size"])]
+
+    reference = reference_cache.stats()
+    for key in ("hits", "misses"):
+        yield f"reference_cache_{key}_total", "counter", f"Reference data cache {key}.", [({}, reference[key])]
+
+    negative = negative_cache.stats()
+    for key in ("hits", "misses", "evictions", "invalidations"):
+        yield f"negative_cache_{key}_total", "counter", f"Search miss cache {key}.", [({}, negative[key])]
+    yield "negative_cache_size", "gauge", "Search terms remembered as misses.", [({}, negative["size"])]
+
+
+def collect_pool_stats():
+    pool = engine.pool.stats()
+    for key in ("size", "checked_in", "checked_out", "overflow"):
+        yield f"db_pool_{key}", "gauge", f"DB connection pool {key.replace('_', ' ')} connections.", [({}, pool[key])]
+    yield "db_pool_checkouts_total", "counter", "DB connection checkouts.", [({}, pool["checkouts"])]
+    yield "db_pool_timeouts_total", "counter", "DB connection checkouts that timed out.", [({}, pool["timeouts"])]
+    yield "db_pool_wait_seconds_total", "counter", "Time spent waiting for a DB connection.", [({}, pool["wait_time_total"])]
+
+
+def collect_replica_stats():
+    replicas = replica_router.replicas
+    if not replicas:
+        return
+    healthy = [({"replica": replica.name}, int(replica.healthy)) for replica in replicas]
+    lag = [({"replica": replica.name}, replica.lag) for replica in replicas if replica.lag is not None]
+    reads = [({"replica": replica.name}, replica.reads) for replica in replicas]
+    yield "db_replica_healthy", "gauge", "Whether reads are routed to the replica (1) or not (0).", healthy
+    yield "db_replica_lag_seconds", "gauge", "Replication lag measured by the last health check.", lag
+    yield "db_replica_reads_total", "counter", "Read sessions routed to the replica.", reads
+    yield "db_primary_reads_total", "counter", "Read sessions that fell back to the primary.", [({}, replica_router.primary_reads)]
+
+
+def collect_search_history_stats():
+    aggregator = search_history_aggregator
+    yield "search_history_flushes_total", "counter", "Search history flushes.", [({}, aggregator.flushes)]
+    yield "search_history_flushed_terms_total", "counter", "Search terms written by flushes.", [({}, aggregator.flushed_terms)]
+    yield "search_history_flush_errors_total", "counter", "Failed search history flushes.", [({}, aggregator.flush_errors)]
+    yield "search_history_dropped_terms_total", "counter", "Search terms not recorded (invalid, buffer full or rejected by the database).", [({}, aggregator.dropped_terms)]
+    yield "search_history_pending_terms", "gauge", "Search terms waiting for the next flush.", [({}, aggregator.pending_count())]
+
+
+def collect_live_search_stats():
+    stats = live_search.stats()
+    yield "live_search_connections", "gauge", "Open autocomplete WebSocket connections.", [({}, stats["connections"])]
+    yield "live_search_queries_total", "counter", "Autocomplete queries received over WebSocket.", [({}, stats["queries"])]
+    yield "live_search_superseded_total", "counter", "In-flight autocomplete queries cancelled by a newer term.", [({}, stats["superseded"])]
+    yield "live_search_throttled_total", "counter", "Autocomplete queries rejected by the per-connection rate limit.", [({}, stats["throttled"])]
+    yield "live_search_commits_total", "counter", "Search terms committed over WebSocket.", [({}, stats["commits"])]
+
+
+instrument_engine(engine.sync_engine)
+for replica in replica_router.replicas:
+    instrument_engine(replica.engine.sync_engine)
+registry.register_collector(collect_cache_stats)
+registry.register_collector(collect_pool_stats)
+registry.register_collector(collect_replica_stats)
+registry.register_collector(collect_search_history_stats)
+registry.register_collector(collect_live_search_stats)
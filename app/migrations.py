@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+from typing import Awaitable, Callable, List, NamedTuple
+
+from sqlalchemy import (BigInteger, Boolean, Column, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        TIMESTAMP, func, text)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.database import engine
+
+# 여러 컨테이너가 동시에 배포돼도 한 곳에서만 적용되도록 잡는 advisory lock 키
+MIGRATION_LOCK_KEY = 7_240_416
+
+# 한국어는 형태소 사전이 없으므로 'simple' 설정으로 토큰화하고, 품목명(A)과 소분류명(B)에 가중치를 둔다
+SEARCH_VECTOR_FUNCTION_BODY = """
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.item_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM subcategory WHERE id = NEW.subcategory_id), '')), 'B');
+    RETURN NEW;
+END
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+# 마이그레이션 1 시점의 테이블 정의. models가 바뀌어도 이 버전이 만드는 스키마는 달라지면 안 되므로 따로 고정해 둔다
+SCHEMA_V1 = MetaData()
+
+Table(
+    "category", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("name", String(20), index=True),
+    Column("image", String(255), nullable=True),
+)
+
+Table(
+    "subcategory", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("category_id", BigInteger, ForeignKey("category.id")),
+    Column("name", String(50), index=True),
+)
+
+Table(
+    "prohibited_items", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("subcategory_id", BigInteger, ForeignKey("subcategory.id")),
+    Column("item_name", String, index=True),
+    Column("image_path", String(255), nullable=True),
+    Column("search_vector", TSVECTOR, nullable=False),
+)
+
+Table(
+    "flight_options", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("option", String(50), nullable=False),
+)
+
+Table(
+    "field_options", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("option", String(50), nullable=False),
+)
+
+Table(
+    "conditions", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("prohibited_item_id", BigInteger, ForeignKey("prohibited_items.id")),
+    Column("flight_option_id", BigInteger, ForeignKey("flight_options.id")),
+    Column("field_option_id", BigInteger, ForeignKey("field_options.id")),
+    Column("condition", Text, nullable=False),
+    Column("allowed", Boolean, nullable=False),
+)
+
+Table(
+    "item_verdicts", SCHEMA_V1,
+    Column("prohibited_item_id", BigInteger, ForeignKey("prohibited_items.id", ondelete="CASCADE"), primary_key=True),
+    Column("scope", String(20), primary_key=True),
+    Column("item_name", String, nullable=False),
+    Column("category", String(20), nullable=True),
+    Column("subcategory", String(50), nullable=True),
+    Column("image_path", String(255), nullable=True),
+    Column("flight_option", String(50), nullable=True),
+    Column("cabin", JSONB, nullable=False),
+    Column("trust", JSONB, nullable=False),
+    Index("ix_item_verdicts_item_name_scope", "item_name", "scope"),
+)
+
+Table(
+    "search_history", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("search_term", String(255)),
+    Column("prohibited_item_id", BigInteger, ForeignKey("prohibited_items.id"), nullable=True),
+    Column("search_count", Integer),
+    Index("uq_search_history_search_term", "search_term", unique=True),
+    Index("ix_search_history_top", "search_count", postgresql_where=text("prohibited_item_id IS NOT NULL")),
+)
+
+Table(
+    "search_history_hourly", SCHEMA_V1,
+    Column("bucket_start", TIMESTAMP, primary_key=True),
+    Column("search_term", String(255), primary_key=True),
+    Column("prohibited_item_id", BigInteger, ForeignKey("prohibited_items.id", ondelete="CASCADE"), nullable=True),
+    Column("search_count", Integer, nullable=False),
+)
+
+Table(
+    "suggestions", SCHEMA_V1,
+    Column("id", BigInteger, primary_key=True, index=True, autoincrement=True),
+    Column("suggestion_text", Text, nullable=False),
+    Column("created_at", TIMESTAMP),
+)
+
+
+async def create_tables(conn):
+    # 이미 있는 테이블은 건너뛴다. 이후 컬럼 변경은 새 버전의 마이그레이션으로 추가한다
+    await conn.run_sync(SCHEMA_V1.create_all)
+
+
+async def create_search_vector_trigger(conn):
+    # 함수 본문이 현재 정의와 다르면(예: 예전 english 설정 트리거) 교체 후 기존 행을 다시 색인
+    current_body = (await conn.execute(text("""
+        SELECT prosrc FROM pg_proc WHERE proname = 'update_search_vector';
+    """))).scalar()
+
+    if current_body is None or current_body.strip() != SEARCH_VECTOR_FUNCTION_BODY.strip():
+        await conn.execute(text(
+            "CREATE OR REPLACE FUNCTION update_search_vector() RETURNS trigger AS $$"
+            + SEARCH_VECTOR_FUNCTION_BODY
+            + "$$ LANGUAGE plpgsql;"
+        ))
+        await conn.execute(text("DROP TRIGGER IF EXISTS tsvectorupdate ON prohibited_items;"))
+        await conn.execute(text("""
+            CREATE TRIGGER tsvectorupdate BEFORE INSERT OR UPDATE
+            ON prohibited_items FOR EACH ROW EXECUTE PROCEDURE update_search_vector();
+        """))
+        await conn.execute(text("UPDATE prohibited_items SET item_name = item_name;"))
+
+    await conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_search_vector
+        ON prohibited_items USING gin(search_vector);
+    """))
+
+
+async def create_item_name_trigram_index(conn):
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_prohibited_items_item_name_trgm
+        ON prohibited_items USING gin(item_name gin_trgm_ops);
+    """))
+
+
+async def create_search_history_index(conn):
+    # 검색어별 카운터를 ON CONFLICT로 누적하기 위한 유니크 인덱스. 기존 중복 행은 하나로 합친다
+    index_exists = (await conn.execute(text("SELECT to_regclass('uq_search_history_search_term')"))).scalar()
+
+    if index_exists is None:
+        await conn.execute(text("""
+            UPDATE search_history h
+            SET search_count = merged.total,
+                prohibited_item_id = coalesce(h.prohibited_item_id, merged.prohibited_item_id)
+            FROM (
+                SELECT search_term, min(id) AS keep_id, sum(coalesce(search_count, 1)) AS total,
+                       max(prohibited_item_id) AS prohibited_item_id
+                FROM search_history
+                GROUP BY search_term
+                HAVING count(*) > 1
+            ) AS merged
+            WHERE h.id = merged.keep_id;
+        """))
+        await conn.execute(text("""
+            DELETE FROM search_history h
+            USING search_history keep
+            WHERE h.search_term = keep.search_term AND h.id > keep.id;
+        """))
+        await conn.execute(text("""
+            CREATE UNIQUE INDEX uq_search_history_search_term ON search_history (search_term);
+        """))
+
+    # 전체 기간 인기 검색어(ORDER BY search_count DESC) 조회용
+    await conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_search_history_top
+        ON search_history (search_count) WHERE prohibited_item_id IS NOT NULL;
+    """))
+
+
+# 마이그레이션 5 시점의 catalog_changes 정의
+CATALOG_CHANGES_V5 = Table(
+    "catalog_changes", MetaData(),
+    Column("version", BigInteger, primary_key=True, autoincrement=True),
+    Column("entity", String(20), nullable=False),
+    Column("entity_id", BigInteger, nullable=True),
+    Column("change", String(10), nullable=False),
+    Column("changed_at", TIMESTAMP, nullable=False, server_default=func.now()),
+)
+
+
+async def create_catalog_changes(conn):
+    await conn.run_sync(CATALOG_CHANGES_V5.create, checkfirst=True)
+    # 변경 기록을 시작하기 전의 카탈로그는 변경분으로 재구성할 수 없으므로 기준점을 남긴다.
+    # 이 버전보다 이전 버전에서 동기화하려는 클라이언트는 전체 내보내기부터 다시 받는다
+    await conn.execute(text("INSERT INTO catalog_changes (entity, change) VALUES ('catalog', 'baseline')"))
+
+
+# 적용 순서대로 나열한다. 이미 배포된 버전은 고치지 말고 새 버전을 뒤에 추가한다.
+# 1~4는 예전 init_db가 기동 때마다 하던 작업으로, 그 스키마가 이미 있는 DB에서도 그대로 통과한다
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", create_tables),
+    Migration(2, "search vector trigger", create_search_vector_trigger),
+    Migration(3, "item name trigram index", create_item_name_trigram_index),
+    Migration(4, "search history unique term", create_search_history_index),
+    Migration(5, "catalog change log", create_catalog_changes),
+]
+
+
+async def create_migrations_table(conn):
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """))
+
+
+async def get_applied_versions(conn) -> List[int]:
+    exists = (await conn.execute(text("SELECT to_regclass('schema_migrations')"))).scalar()
+    if exists is None:
+        return []
+    return list((await conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))).scalars())
+
+
+async def get_pending_migrations(conn) -> List[Migration]:
+    applied = set(await get_applied_versions(conn))
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+async def migrate(bind: AsyncEngine = engine) -> List[Migration]:
+    """아직 적용되지 않은 마이그레이션을 한 트랜잭션으로 적용하고 적용한 목록을 반환한다."""
+    async with bind.begin() as conn:
+        # 검색 벡터 백필처럼 오래 걸리는 DDL에는 요청용 statement_timeout을 적용하지 않는다
+        await conn.execute(text("SET LOCAL statement_timeout = 0"))
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        await create_migrations_table(conn)
+
+        pending = await get_pending_migrations(conn)
+        for migration in pending:
+            await migration.apply(conn)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": migration.version, "name": migration.name}
+            )
+    return pending
+
+
+async def main(status: bool):
+    if status:
+        async with engine.connect() as conn:
+            applied = set(await get_applied_versions(conn))
+        for migration in MIGRATIONS:
+            print(f"{migration.version:>4}  {'applied' if migration.version in applied else 'pending':<8} {migration.name}")
+    else:
+        applied = await migrate()
+        for migration in applied:
+            print(f"applied {migration.version}: {migration.name}")
+        if not applied:
+            print("schema is up to date")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB 스키마 마이그레이션을 적용합니다. 배포마다 서버 기동 전에 한 번 실행합니다.")
+    parser.add_argument("--status", action="store_true", help="적용하지 않고 버전별 적용 여부만 출력")
+    args = parser.parse_args()
+    asyncio.run(main(args.status))
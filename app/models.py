@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, TIMESTAMP, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, Boolean, BigInteger, TIMESTAMP, ForeignKey, Index, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.types import UserDefinedType
 from sqlalchemy.ext.compiler import compiles
@@ -44,7 +45,7 @@ class ProhibitedItem(Base):
 
     subcategory = relationship("Subcategory", back_populates="prohibited_items")
     search_histories = relationship("SearchHistory", back_populates="prohibited_item")
-    conditions = relationship("Condition", back_populates="prohibited_item")
+    conditions = relationship("Condition", back_populates="prohibited_item", order_by="Condition.id")
 
 
 class FlightOption(Base):
@@ -74,6 +75,32 @@ class Condition(Base):
     flight_option = relationship("FlightOption", back_populates="conditions")
     field_option = relationship("FieldOption", back_populates="conditions")
     
+class ItemVerdict(Base):
+    # 품목 x 항공편 범위(scope)별로 미리 계산해 둔 상세 응답. 상세 조회는 PK 한 번으로 끝난다
+    __tablename__ = "item_verdicts"
+    prohibited_item_id = Column(BigInteger, ForeignKey('prohibited_items.id', ondelete="CASCADE"), primary_key=True)
+    scope = Column(String(20), primary_key=True)
+    item_name = Column(String, nullable=False)
+    category = Column(String(20), nullable=True)
+    subcategory = Column(String(50), nullable=True)
+    image_path = Column(String(255), nullable=True)
+    flight_option = Column(String(50), nullable=True)
+    cabin = Column(JSONB, nullable=False)
+    trust = Column(JSONB, nullable=False)
+
+    __table_args__ = (
+        Index("ix_item_verdicts_item_name_scope", "item_name", "scope"),
+    )
+
+class CatalogChange(Base):
+    # 카탈로그 변경 로그. version이 카탈로그 버전이며, 클라이언트는 받은 버전 이후의 변경분만 동기화한다
+    __tablename__ = "catalog_changes"
+    version = Column(BigInteger, primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(BigInteger, nullable=True)
+    change = Column(String(10), nullable=False)
+    changed_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
 class SearchHistory(Base):
     __tablename__ = "search_history"
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
@@ -83,6 +110,19 @@ class SearchHistory(Base):
     
     prohibited_item = relationship("ProhibitedItem", back_populates="search_histories")
 
+    __table_args__ = (
+        Index("uq_search_history_search_term", "search_term", unique=True),
+        Index("ix_search_history_top", "search_count", postgresql_where=text("prohibited_item_id IS NOT NULL")),
+    )
+
+class SearchHistoryHourly(Base):
+    # 검색어별 시간 단위 검색 횟수. 최근 24시간/7일 인기 검색어 집계용이며 보존 기간이 지나면 지운다
+    __tablename__ = "search_history_hourly"
+    bucket_start = Column(TIMESTAMP, primary_key=True)
+    search_term = Column(String(255), primary_key=True)
+    prohibited_item_id = Column(BigInteger, ForeignKey('prohibited_items.id', ondelete="CASCADE"), nullable=True)
+    search_count = Column(Integer, nullable=False, default=0)
+
 class Suggestion(Base):
     __tablename__ = "suggestions"
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
@@ -0,0 +1,69 @@
+import base64
+import binascii
+from typing import Callable, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import NEXT_CURSOR_HEADER, CachedPayload, reference_cache
+from app.crud import get_subcategories
+from app.schemas import Subcategory
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(kind: str, *values) -> str:
+    # 정렬 키의 마지막 값을 담은 불투명 커서. kind로 다른 목록의 커서를 잘못 넘기는 것을 막는다
+    return base64.urlsafe_b64encode(orjson.dumps([kind, *values])).decode().rstrip("=")
+
+
+# 커서 값으로 쓰는 정수는 BIGINT 범위로 제한한다
+MAX_CURSOR_INT = 2 ** 63 - 1
+
+
+def is_cursor_value(value, expected: type) -> bool:
+    if expected is int:
+        return type(value) is int and -MAX_CURSOR_INT - 1 <= value <= MAX_CURSOR_INT
+    return type(value) is expected
+
+
+def decode_cursor(kind: str, cursor: str, expected: Tuple[type, ...]) -> list:
+    # 값의 개수와 타입까지 확인해, 조작한 커서가 조회 단계에서 500이 되지 않고 400으로 끝나게 한다
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+    if (not isinstance(values, list) or len(values) != len(expected) + 1 or values[0] != kind
+            or not all(is_cursor_value(value, value_type) for value, value_type in zip(values[1:], expected))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[1:]
+
+
+def split_page(rows: list, limit: int, cursor_of: Callable[[object], str]) -> Tuple[list, Optional[str]]:
+    # limit + 1건을 읽어 한 건이 더 있으면 다음 페이지가 있는 것이다
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursor_of(rows[-1])
+    return rows, None
+
+
+def page_response(body: bytes, next_cursor: Optional[str]) -> Response:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+SUBCATEGORIES = "subcategories"
+
+
+async def get_subcategory_page(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> CachedPayload:
+    # id 순 keyset 페이지네이션이라 몇 번째 페이지든 PK 인덱스 범위 조회 한 번이다
+    after_id = decode_cursor(SUBCATEGORIES, cursor, (int,))[0] if cursor else None
+    fetch = lambda: get_subcategories(db, after_id=after_id, limit=limit + 1)
+    paginate = lambda rows: split_page(rows, limit, lambda row: encode_cursor(SUBCATEGORIES, row.id))
+    if cursor is None:
+        # 자주 읽히는 첫 페이지만 캐시한다
+        return await reference_cache.get(f"{SUBCATEGORIES}:{limit}", Subcategory, fetch, paginate)
+    rows: List = await fetch()
+    return reference_cache.encode(Subcategory, *paginate(rows))
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import engine, replica_engines, settings
+from app.metrics import _request_db, _request_scope, current_route
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMETERS_LENGTH = 500
+
+# EXPLAIN ANALYZE는 쿼리를 실제로 다시 실행하므로 테이블을 읽기만 하는 SELECT만 고른다.
+# FROM이 없는 SELECT(pg_advisory_xact_lock 같은 함수 호출)나 행 잠금을 거는 SELECT는 다시 실행하면 잠금을 잡는다
+EXPLAINABLE = re.compile(r"^\s*SELECT\b(?=.*\bFROM\b)(?!.*\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b)",
+                         re.IGNORECASE | re.DOTALL)
+
+# 엔드포인트별 요청 하나가 실행해도 되는 최대 쿼리 수 ("메서드 경로 템플릿" -> 쿼리 수).
+# 캐시/스냅샷 미스로 DB까지 가는 경우 기준이며, 새 엔드포인트를 추가하면 여기에도 적는다
+QUERY_BUDGETS: Dict[str, int] = {
+    "GET /items/": 1,
+    "GET /items/{item_id}/": 1,
+    "GET /items/search/conditions/": 3,
+    "POST /items/verdicts/": 1,
+    "GET /categories/": 1,
+    "GET /subcategories/": 1,
+    "GET /flight_options/": 1,
+    "GET /field_options/": 1,
+    "GET /search_history": 0,
+    "GET /catalog/version": 1,
+}
+
+
+def format_parameters(parameters) -> str:
+    text = repr(parameters)
+    return text if len(text) <= MAX_PARAMETERS_LENGTH else text[:MAX_PARAMETERS_LENGTH] + "..."
+
+
+class QueryProfiler:
+    """엔진 이벤트로 느린 쿼리를 잡아 요청 경로, 바인딩 값과 함께 로그로 남기는 프로파일러.
+
+    기본은 꺼져 있고 profiling.enabled로 켠다. 느린 SELECT 중 explain_sample_rate 비율만큼은
+    별도 연결에서 EXPLAIN (ANALYZE, BUFFERS)를 한 번 더 실행해 실행 계획을 함께 남긴다.
+    최근 기록은 /stats/slow_queries로 본다.
+    """
+
+    def __init__(self, slow_query_ms: float, explain_sample_rate: float, log_parameters: bool, history: int = 100):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.log_parameters = log_parameters
+        self.recent: Deque[dict] = deque(maxlen=history)
+        self._engines: Dict[object, AsyncEngine] = {}
+        # EXPLAIN ANALYZE는 쿼리를 다시 실행하므로 한 번에 하나만 돌린다
+        self._explaining = False
+        self._tasks = set()
+
+        self.slow_queries = 0
+        self.explains = 0
+
+    def install(self, async_engine: AsyncEngine):
+        sync_engine = async_engine.sync_engine
+        self._engines[sync_engine] = async_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("profiling_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if elapsed < self.slow_query_seconds or statement.startswith("EXPLAIN"):
+            return
+
+        self.slow_queries += 1
+        record = {
+            "route": current_route(),
+            "ms": round(elapsed * 1000, 2),
+            "statement": statement,
+            "parameters": format_parameters(parameters) if self.log_parameters else None,
+            "at": time.time(),
+            "plan": None,
+        }
+        self.recent.append(record)
+        logger.warning("slow query %.1fms route=%s params=%s\n%s",
+                       record["ms"], record["route"], record["parameters"], statement)
+
+        if (not executemany and not self._explaining and random.random() < self.explain_sample_rate
+                and EXPLAINABLE.match(statement)):
+            self._explaining = True
+            task = asyncio.get_running_loop().create_task(self._explain(self._engines[conn.engine], record, parameters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, async_engine: AsyncEngine, record: dict, parameters):
+        # 태스크는 요청의 컨텍스트를 복사해 시작하므로, EXPLAIN이 그 요청의 쿼리로 세어지지 않게 떼어 낸다
+        _request_db.set(None)
+        _request_scope.set(None)
+        try:
+            async with async_engine.connect() as conn:
+                result = await conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + record["statement"], parameters)
+                record["plan"] = "\n".join(row[0] for row in result)
+                # 같은 트랜잭션에서 다시 실행한 쿼리는 남기지 않는다
+                await conn.rollback()
+            self.explains += 1
+            logger.warning("plan for slow query on route=%s\n%s", record["route"], record["plan"])
+        except Exception as e:
+            logger.warning("EXPLAIN for slow query failed: %r", e)
+        finally:
+            self._explaining = False
+
+    def stats(self) -> dict:
+        return {
+            "slow_query_ms": self.slow_query_seconds * 1000,
+            "slow_queries": self.slow_queries,
+            "explains": self.explains,
+            "recent": list(self.recent),
+        }
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: Optional[int] = None,
+                 engines: Optional[List[AsyncEngine]] = None) -> Iterator[Dict[Tuple[str, int], List[str]]]:
+    """블록 안에서 처리된 요청마다 실행한 쿼리 수를 세어 예산을 넘으면 QueryBudgetExceeded를 던진다.
+
+    테스트/CI에서 TestClient 호출을 감싸 N+1 회귀를 잡는 용도다. 예산은 max_queries를 주면 모든 요청에
+    그 값을, 아니면 QUERY_BUDGETS의 엔드포인트별 값을 쓰고, 둘 다 없는 엔드포인트는 검사하지 않는다.
+    요청 밖(백그라운드 작업)의 쿼리는 세지 않는다.
+    """
+    # (라우트, 요청 번호) -> 실행한 SQL 목록. 요청 번호는 scope의 id이므로 블록이 끝날 때까지 scope를 붙잡아 둔다
+    statements: Dict[Tuple[str, int], List[str]] = defaultdict(list)
+    scopes: Dict[int, dict] = {}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        scope = _request_scope.get()
+        if scope is not None:
+            scopes[id(scope)] = scope
+            statements[(current_route(), id(scope))].append(statement)
+
+    sync_engines = [async_engine.sync_engine for async_engine in (engines or [engine, *replica_engines])]
+    for sync_engine in sync_engines:
+        event.listen(sync_engine, "after_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        for sync_engine in sync_engines:
+            event.remove(sync_engine, "after_cursor_execute", count)
+
+    exceeded = []
+    for (route, _), executed in statements.items():
+        budget = max_queries if max_queries is not None else QUERY_BUDGETS.get(route)
+        if budget is not None and len(executed) > budget:
+            exceeded.append(f"{route}: {len(executed)} queries (budget {budget})\n  " + "\n  ".join(executed))
+    if exceeded:
+        raise QueryBudgetExceeded("query budget exceeded\n" + "\n".join(exceeded))
+
+
+profiler = QueryProfiler(settings.profiling_slow_query_ms, settings.profiling_explain_sample_rate,
+                         settings.profiling_log_parameters)
+if settings.profiling_enabled:
+    for profiled_engine in (engine, *replica_engines):
+        profiler.install(profiled_engine)
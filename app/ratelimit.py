@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import tempfile
+import time
+import urllib.parse
+from typing import Optional, Tuple, Type, Union
+
+from limits.storage import Storage
+
+# /dev/shm이 있으면 메모리 위에 파일을 두어 디스크 I/O 없이 같은 호스트의 워커끼리 공유한다
+DEFAULT_PATH = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "airsafe-ratelimit.sqlite")
+
+# 만료된 키는 이 횟수만큼 incr할 때마다 한 번씩 지운다
+PURGE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# 한 문장으로 증가와 만료 처리를 끝내므로 여러 프로세스가 동시에 불러도 카운트가 빠지지 않는다.
+# ON CONFLICT의 SET 식은 갱신 전 값을 기준으로 계산된다
+INCR = """
+INSERT INTO rate_limits (key, value, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT (key) DO UPDATE SET
+    value = CASE WHEN expires_at <= :now THEN excluded.value ELSE value + excluded.value END,
+    expires_at = CASE WHEN expires_at <= :now OR :elastic THEN excluded.expires_at ELSE expires_at END
+RETURNING value
+"""
+
+
+class SQLiteStorage(Storage):
+    """같은 호스트의 uvicorn 워커들이 함께 쓰는 SQLite 기반 rate limit 저장소.
+
+    ``sqlite:///경로`` 형식의 URI로 만들고, 경로를 생략하면 DEFAULT_PATH를 쓴다.
+    요청마다 네트워크 왕복 없이 로컬 파일에 원자적 UPSERT 한 번으로 카운트를 올린다.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, timeout: float = 5.0, **options):
+        path = urllib.parse.urlparse(uri).path if uri else ""
+        self.path = path or DEFAULT_PATH
+        self.timeout = timeout
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._incr_count = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[Type[Exception], Tuple[Type[Exception], ...]]:
+        return sqlite3.Error
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # fork된 워커는 부모의 연결을 물려받지 않고 새로 연다
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self.lock:
+            value = self.connection.execute(INCR, {
+                "key": key, "amount": amount, "expires_at": now + expiry, "now": now, "elastic": elastic_expiry
+            }).fetchone()[0]
+            self._incr_count += 1
+            if self._incr_count % PURGE_EVERY == 0:
+                self.connection.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> int:
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return int(row[0] if row else now)
+
+    def check(self) -> bool:
+        try:
+            with self.lock:
+                self.connection.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self.lock:
+            return self.connection.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.database import SessionLocal, replica_engines, settings
+
+logger = logging.getLogger(__name__)
+
+# 복제 지연(초). 프라이머리로 승격됐으면 0, 받은 WAL을 모두 재생했고 스트리밍 중이면 0,
+# 그 외에는 마지막으로 재생한 트랜잭션 이후 지난 시간이다. 알 수 없으면 NULL
+REPLICATION_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+             AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        # 유닉스 소켓 접속이면 host가 쿼리 파라미터에 있다
+        self.name = f"{engine.url.host or engine.url.query.get('host')}:{engine.url.port or engine.url.query.get('port')}"
+        self.sessionmaker = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+        # 첫 확인이 끝나기 전까지는 읽기를 보내지 않는다
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """읽기 전용 요청의 세션을 복제본에 나눠 주고, 쓰기는 프라이머리(SessionLocal)에 남긴다.
+
+    복제 지연을 주기적으로 확인해 max_lag 이내인 복제본만 라운드로빈으로 쓰고, 쓸 수 있는 복제본이 없으면
+    프라이머리로 읽는다. 이 워커에서 카탈로그를 쓴 직후 max_lag 동안은 방금 쓴 내용이 보이도록 프라이머리로 읽는다.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.replicas = [Replica(engine) for engine in engines]
+        self._round_robin = itertools.count()
+        self._primary_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+
+    async def _measure_lag(self, replica: Replica) -> Optional[float]:
+        async with replica.engine.connect() as conn:
+            return (await conn.execute(REPLICATION_LAG_QUERY)).scalar()
+
+    async def check(self, replica: Replica):
+        was_healthy = replica.healthy
+        try:
+            # 네트워크가 끊겨 접속 자체가 멈추는 경우도 한 주기 안에 실패로 본다
+            lag = await asyncio.wait_for(self._measure_lag(replica), self.check_interval)
+        except Exception as e:
+            replica.healthy, replica.lag, replica.error = False, None, repr(e)
+        else:
+            replica.lag = float(lag) if lag is not None else None
+            replica.healthy = replica.lag is not None and replica.lag <= self.max_lag
+            replica.error = None
+        replica.checked_at = time.time()
+        # 상태가 바뀔 때만 남긴다
+        if was_healthy and not replica.healthy:
+            logger.warning("replica %s removed from reads (lag=%s, error=%s)", replica.name, replica.lag, replica.error)
+        elif replica.healthy and not was_healthy:
+            logger.info("replica %s serving reads (lag=%s)", replica.name, replica.lag)
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    def mark_write(self):
+        self._primary_until = time.monotonic() + self.max_lag
+
+    def mark_failed(self, engine: AsyncEngine):
+        # 요청 중 연결이 끊긴 복제본은 다음 확인 때까지 빼 둔다
+        for replica in self.replicas:
+            if replica.engine is engine:
+                replica.healthy = False
+
+    def choose(self) -> Optional[Replica]:
+        if time.monotonic() < self._primary_until:
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def session(self) -> AsyncSession:
+        replica = self.choose()
+        if replica is None:
+            self.primary_reads += 1
+            return SessionLocal()
+        replica.reads += 1
+        return replica.sessionmaker()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception:
+                logger.exception("replica health check failed")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self._task is None and self.replicas:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_lag": self.max_lag,
+            "primary_pinned": time.monotonic() < self._primary_until,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"name": replica.name, "healthy": replica.healthy, "lag": replica.lag, "error": replica.error,
+                 "checked_at": replica.checked_at, "reads": replica.reads, "pool": replica.engine.pool.stats()}
+                for replica in self.replicas
+            ]
+        }
+
+
+replica_router = ReplicaRouter(replica_engines, settings.replica_max_lag, settings.replica_check_interval)
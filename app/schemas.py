@@ -1,6 +1,20 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 from datetime import datetime
+from enum import Enum
+
+class SearchMode(str, Enum):
+    basic = "basic"
+    ranked = "ranked"
+
+class TrendingWindow(str, Enum):
+    day = "24h"
+    week = "7d"
+    all_time = "all"
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
 
 class ConditionBase(BaseModel):
     flight_option_id: int
@@ -66,13 +80,32 @@ class ProhibitedItemCondition(BaseModel):
     subcategory: str
     item_name: str
     image_path: Optional[str] = None
-    flight_option: str
+    flight_option: Optional[str] = None
     cabin: dict
     trust: dict
 
     class Config:
         from_attributes = True
 
+MAX_VERDICT_BATCH_SIZE = 100
+
+class VerdictBatchRequest(BaseModel):
+    item_ids: List[int] = []
+    item_names: List[str] = []
+    is_international: Optional[bool] = None
+    is_domestic: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def check_batch_size(self):
+        if len(self.item_ids) + len(self.item_names) > MAX_VERDICT_BATCH_SIZE:
+            raise ValueError(f"item_ids와 item_names는 합쳐서 {MAX_VERDICT_BATCH_SIZE}개까지 요청할 수 있습니다")
+        return self
+
+class VerdictBatchResponse(BaseModel):
+    items: List[ProhibitedItemCondition] = []
+    not_found_ids: List[int] = []
+    not_found_names: List[str] = []
+
 class SubcategoryBase(BaseModel):
     id: int
     name: str
@@ -138,4 +171,13 @@ class Suggestion(SuggestionBase):
     
 class SearchHistoryResponse(BaseModel):
     prohibited_item_id: int
-    search_term: str
\ No newline at end of file
+    search_term: str
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError] = []
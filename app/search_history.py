@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError
+
+from app.crud import upsert_search_history_counts
+from app.database import SessionLocal, settings
+
+logger = logging.getLogger(__name__)
+
+# search_history.search_term 컬럼 길이
+MAX_TERM_LENGTH = 255
+
+
+def is_row_error(error: Exception) -> bool:
+    # 행 하나 때문에 실패하는 오류인지. SQLSTATE 22(길이 초과, 잘못된 문자 등), 23(외래 키 위반 등)
+    sqlstate = getattr(getattr(error, "orig", None), "sqlstate", None) or ""
+    return isinstance(error, DBAPIError) and sqlstate[:2] in ("22", "23")
+
+
+def current_bucket() -> datetime:
+    # 시간 단위 버킷 시작 시각(UTC, tz 없는 TIMESTAMP 컬럼 기준)
+    return datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+
+
+class SearchHistoryAggregator:
+    """검색 기록을 요청 경로 밖에서 모아 두었다가 주기적으로 한 번에 반영하는 write-behind 버퍼.
+
+    search_history는 search_term 기준 유니크이므로 (검색어 -> [누적 횟수, 마지막 품목 id])로
+    합산하고, flush 시 INSERT ... ON CONFLICT DO UPDATE 한 문장으로 증가분을 더한다.
+
+    컬럼에 넣을 수 없는 검색어는 받지 않고, 대기 중인 검색어는 max_pending개까지만 모은다.
+    배치가 특정 행 때문에 실패하면 절반씩 나눠 다시 써서 그 행만 버리고, DB 장애처럼 배치 전체가
+    실패한 경우에만 다음 주기로 넘긴다.
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.flushed_terms = 0
+        self.flush_errors = 0
+        self.dropped_terms = 0
+
+    def record(self, search_term: str, prohibited_item_id: Optional[int] = None):
+        if search_term is None:
+            return
+        if len(search_term) > MAX_TERM_LENGTH or "\x00" in search_term:
+            self.dropped_terms += 1
+            return
+        with self._lock:
+            entry = self._pending.get(search_term)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    self.dropped_terms += 1
+                    return
+                self._pending[search_term] = [1, prohibited_item_id]
+            else:
+                entry[0] += 1
+                if prohibited_item_id is not None:
+                    entry[1] = prohibited_item_id
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _drain(self) -> Dict[str, Tuple[int, Optional[int]]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {search_term: (count, prohibited_item_id) for search_term, (count, prohibited_item_id) in pending.items()}
+
+    def _restore(self, counts: Dict[str, Tuple[int, Optional[int]]]):
+        # flush 실패 시 증가분을 버리지 않고 다음 주기로 넘긴다
+        with self._lock:
+            for search_term, (count, prohibited_item_id) in counts.items():
+                entry = self._pending.get(search_term)
+                if entry is None:
+                    self._pending[search_term] = [count, prohibited_item_id]
+                else:
+                    entry[0] += count
+                    if entry[1] is None:
+                        entry[1] = prohibited_item_id
+
+    async def _write(self, counts: Dict[str, Tuple[int, Optional[int]]], bucket_start: datetime):
+        async with SessionLocal() as db:
+            try:
+                await upsert_search_history_counts(db, counts, bucket_start=bucket_start)
+            except Exception:
+                await db.rollback()
+                raise
+
+    async def _write_isolated(self, counts: Dict[str, Tuple[int, Optional[int]]], bucket_start: datetime) -> int:
+        # 실패한 배치를 절반씩 나눠 다시 쓴다. 혼자서도 실패하는 검색어는 버리고, 행과 무관한 오류면 남은 분량을 다음 주기로 넘긴다
+        if len(counts) == 1:
+            search_term = next(iter(counts))
+            self.dropped_terms += 1
+            logger.warning("search history term dropped, it cannot be written: %r", search_term[:50])
+            return 0
+
+        items = list(counts.items())
+        middle = len(items) // 2
+        written = 0
+        for half in (dict(items[:middle]), dict(items[middle:])):
+            try:
+                await self._write(half, bucket_start)
+            except Exception as e:
+                if is_row_error(e):
+                    written += await self._write_isolated(half, bucket_start)
+                else:
+                    self._restore(half)
+                    logger.exception("search history flush failed, %d terms kept for retry", len(half))
+            else:
+                written += len(half)
+        return written
+
+    async def flush(self) -> int:
+        counts = self._drain()
+        if not counts:
+            return 0
+
+        bucket_start = current_bucket()
+        try:
+            await self._write(counts, bucket_start)
+        except Exception as e:
+            self.flush_errors += 1
+            if not is_row_error(e):
+                self._restore(counts)
+                logger.exception("search history flush failed, %d terms kept for retry", len(counts))
+                return 0
+            logger.warning("search history flush failed on a bad row, retrying %d terms in smaller batches", len(counts))
+            written = await self._write_isolated(counts, bucket_start)
+        else:
+            written = len(counts)
+
+        self.flushes += 1
+        self.flushed_terms += written
+        return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+search_history_aggregator = SearchHistoryAggregator(settings.search_history_flush_interval, settings.search_history_max_pending)
@@ -0,0 +1,391 @@
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.autocomplete import FORMS, FormIndex, autocomplete_index, build_forms
+from app.cache import SEARCH_CACHE_KIND, item_response_cache, negative_cache
+from app.catalog import snapshot_session
+from app.crud import get_catalog_version, stream_autocomplete_entries, stream_item_verdicts
+from app.database import settings
+from app.replicas import replica_router
+from app.verdicts import SCOPES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ASCS"
+FORMAT = 2
+NONE = 0xFFFFFFFF
+SCOPE_NAMES = list(SCOPES)
+SCOPE_INDEX = {scope: index for index, scope in enumerate(SCOPE_NAMES)}
+FIELDS = ("cabin", "trust")
+# 스냅샷 빌드 중 DB에서 받는 배치 크기. 배치마다 행 변환은 이벤트 루프에서 하므로 작게 잡는다
+PARTITION_SIZE = 1000
+
+# magic, 형식 버전, 범위 수, 카탈로그 버전, 품목 수
+HEADER = struct.Struct("<4sHHQI")
+# 열마다 (파일 내 위치, 원소 수)
+SECTION = struct.Struct("<QQ")
+
+# 파일에 쓰는 열과 array 타입 코드. 문자열 열은 모두 문자열 표의 번호이고 NONE은 null이다.
+# 품목 열은 id 순, 판정 열은 (품목, 범위) 순, 필드 열은 (품목, 범위, cabin/trust) 순이다
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("string_offsets", "I"),     # 문자열 i는 strings[string_offsets[i]:string_offsets[i + 1]]의 UTF-8
+    ("strings", "B"),
+    ("ids", "q"),
+    ("names", "I"),
+    ("category_images", "I"),
+    ("categories", "I"),
+    ("subcategories", "I"),
+    ("image_paths", "I"),
+    ("name_order", "I"),         # (품목명, id) 순으로 정렬한 품목 위치. 이름 조회용
+    ("flight_options", "I"),
+    ("availabilities", "I"),     # NONE이면 판정이 아직 없는 품목
+    ("condition_offsets", "I"),  # 필드별 조건 설명은 conditions[condition_offsets[k]:condition_offsets[k + 1]]
+    ("conditions", "I"),
+    ("rank_order", "I"),         # 자동완성 순위 순으로 정렬한 품목 위치. 표기별 키 열의 i번째 키가 rank_order[i] 품목이다
+) + tuple(
+    (f"{form}_{name}", code)     # 자동완성 표기별 키 열 (autocomplete.build_forms)
+    for form in FORMS
+    for name, code in (("keys", "B"), ("starts", "I"), ("order", "I"), ("chars", "B"))
+)
+
+
+class _StringTable:
+    # 같은 문자열(조건 설명, 분류명, 판정 기호 ...)은 한 번만 저장한다
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.offsets = array("I", [0])
+        self.blob = array("B")
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.offsets) - 1
+            self.blob.frombytes(value.encode())
+            self.offsets.append(len(self.blob))
+        return position
+
+
+class _ColumnBuilder:
+    """스냅샷 열을 채우는 쪽. DB에서 받은 배치를 스레드에서 넘겨받아 처리하므로 이벤트 루프를 막지 않는다.
+
+    메서드는 add_entries, add_verdicts(여러 번), finish 순으로 한 번에 하나씩만 불린다.
+    """
+
+    def __init__(self):
+        self.strings = _StringTable()
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self.columns["condition_offsets"].append(0)
+        self.names: List[Optional[str]] = []
+        self.position = 0
+        self.pending_id: Optional[int] = None
+        self.pending: dict = {}
+
+    def add_entries(self, entries: list):
+        strings, columns = self.strings, self.columns
+        for item_id, item_name, category_image in sorted(entries):
+            columns["ids"].append(item_id)
+            columns["names"].append(strings.add(item_name))
+            columns["category_images"].append(strings.add(category_image))
+            self.names.append(item_name)
+
+    def _emit(self, rows: dict):
+        strings, columns = self.strings, self.columns
+        first = next(iter(rows.values()), None)
+        for name, attribute in (("categories", "category"), ("subcategories", "subcategory"), ("image_paths", "image_path")):
+            columns[name].append(strings.add(getattr(first, attribute)) if first else NONE)
+        for scope in SCOPE_NAMES:
+            row = rows.get(scope)
+            columns["flight_options"].append(strings.add(row.flight_option) if row else NONE)
+            for field in FIELDS:
+                verdict = getattr(row, field) if row else None
+                if verdict is None:
+                    columns["availabilities"].append(NONE)
+                else:
+                    columns["availabilities"].append(strings.add(verdict["availability"]))
+                    columns["conditions"].extend(strings.add(condition) for condition in verdict["condition_description"])
+                columns["condition_offsets"].append(len(columns["conditions"]))
+
+    def _emit_until(self, item_id: int, rows: dict):
+        # 판정이 없는 품목은 빈 판정으로 채우며 같은 id 순서로 맞춰 간다
+        ids = self.columns["ids"]
+        while self.position < len(ids) and ids[self.position] < item_id:
+            self._emit({})
+            self.position += 1
+        if self.position < len(ids) and ids[self.position] == item_id:
+            self._emit(rows)
+            self.position += 1
+
+    def add_verdicts(self, rows: list):
+        # 판정 행은 품목 id 순으로 오며, 한 품목의 범위별 행이 배치 경계에 걸칠 수 있다
+        for row in rows:
+            if row.prohibited_item_id != self.pending_id:
+                if self.pending_id is not None:
+                    self._emit_until(self.pending_id, self.pending)
+                self.pending_id, self.pending = row.prohibited_item_id, {}
+            self.pending[row.scope] = row
+
+    def finish(self) -> Dict[str, array]:
+        columns, names, ids = self.columns, self.names, self.columns["ids"]
+        if self.pending_id is not None:
+            self._emit_until(self.pending_id, self.pending)
+        for _ in range(self.position, len(ids)):
+            self._emit({})
+        columns["name_order"].extend(sorted((position for position, name in enumerate(names) if name is not None),
+                                            key=lambda position: (names[position], ids[position])))
+        positions = [position for position, name in enumerate(names) if name]
+        rank_order, forms = build_forms([(ids[position], names[position]) for position in positions])
+        columns["rank_order"].extend(positions[index] for index in rank_order)
+        for form, form_columns in forms.items():
+            for name, column in zip(("keys", "starts", "order", "chars"), form_columns):
+                columns[f"{form}_{name}"] = column
+        columns["string_offsets"] = self.strings.offsets
+        columns["strings"] = self.strings.blob
+        return columns
+
+
+async def build_columns(db: AsyncSession) -> Dict[str, array]:
+    # 읽기만 이벤트 루프에서 하고 정렬/문자열 정리/열 채우기는 스레드에서 한다
+    builder = _ColumnBuilder()
+    entries = []
+    async for partition in (await stream_autocomplete_entries(db)).partitions(PARTITION_SIZE):
+        entries.extend(partition)
+    await asyncio.to_thread(builder.add_entries, entries)
+    # 행마다 greenlet을 오가지 않도록 배치 단위로 받는다
+    async for partition in (await stream_item_verdicts(db)).partitions(PARTITION_SIZE):
+        await asyncio.to_thread(builder.add_verdicts, partition)
+    return await asyncio.to_thread(builder.finish)
+
+
+def write_snapshot(path: str, version: int, columns: Dict[str, array]):
+    # 임시 파일에 다 쓴 뒤 rename으로 바꿔 끼우므로 읽는 쪽은 완성된 파일만 본다.
+    # 이전 파일을 매핑 중인 워커는 다음 확인 때까지 이전 내용을 그대로 읽는다
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT, len(SCOPE_NAMES), version, len(columns["ids"])))
+        table = file.tell()
+        file.write(b"\0" * SECTION.size * len(COLUMNS))
+        sections = []
+        for name, _ in COLUMNS:
+            file.write(b"\0" * (-file.tell() % 8))
+            sections.append(SECTION.pack(file.tell(), len(columns[name])))
+            columns[name].tofile(file)
+        file.seek(table)
+        file.write(b"".join(sections))
+    os.replace(temporary, path)
+
+
+class CatalogSnapshot:
+    """읽기 전용으로 매핑한 카탈로그 스냅샷 파일.
+
+    열은 mmap 위의 memoryview라 워커마다 복사하지 않고 페이지 캐시를 함께 쓴다.
+    문자열은 조회할 때만 디코딩하고, 자동완성도 forms의 키 열을 mmap 위에서 바로 찾는다.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._mmap)
+        magic, format_version, scope_count, self.version, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT or scope_count != len(SCOPE_NAMES):
+            raise ValueError(f"unsupported catalog snapshot: {path}")
+
+        view = memoryview(self._mmap)
+        bounds = {}
+        for index, (name, code) in enumerate(COLUMNS):
+            offset, length = SECTION.unpack_from(self._mmap, HEADER.size + index * SECTION.size)
+            bounds[name] = (offset, offset + length * array(code).itemsize)
+            setattr(self, name, view[bounds[name][0]:bounds[name][1]].cast(code))
+        self.forms = {
+            form: FormIndex(self._mmap, *bounds[f"{form}_keys"], getattr(self, f"{form}_starts"),
+                            getattr(self, f"{form}_order"), str(getattr(self, f"{form}_chars"), "utf-8"))
+            for form in FORMS
+        }
+
+    def string(self, index: int) -> Optional[str]:
+        if index == NONE:
+            return None
+        return str(self.strings[self.string_offsets[index]:self.string_offsets[index + 1]], "utf-8")
+
+    def find_id(self, item_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, item_id)
+        if position < self.count and self.ids[position] == item_id:
+            return position
+        return None
+
+    def find_name(self, item_name: str) -> Optional[int]:
+        # 같은 이름이 여럿이면 DB 조회(get_item_verdict)처럼 id가 가장 작은 품목을 고른다
+        low, high = 0, len(self.name_order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(self.names[self.name_order[middle]]) < item_name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.name_order) and self.string(self.names[self.name_order[low]]) == item_name:
+            return self.name_order[low]
+        return None
+
+    def verdict(self, position: int, scope: str) -> Optional[dict]:
+        # verdict_to_dict와 같은 형태로 만든다
+        slot = position * len(SCOPE_NAMES) + SCOPE_INDEX[scope]
+        fields = {}
+        for offset, field in enumerate(FIELDS):
+            key = slot * len(FIELDS) + offset
+            if self.availabilities[key] == NONE:
+                return None
+            conditions = self.conditions[self.condition_offsets[key]:self.condition_offsets[key + 1]]
+            fields[field] = {"availability": self.string(self.availabilities[key]),
+                             "condition_description": [self.string(condition) for condition in conditions]}
+        return {
+            "id": self.ids[position],
+            "category": self.string(self.categories[position]),
+            "subcategory": self.string(self.subcategories[position]),
+            "item_name": self.string(self.names[position]),
+            "image_path": self.string(self.image_paths[position]),
+            "flight_option": self.string(self.flight_options[slot]),
+            "cabin": fields["cabin"],
+            "trust": fields["trust"],
+        }
+
+    def ranked_entry(self, rank: int) -> Tuple[int, Optional[str], Optional[str]]:
+        position = self.rank_order[rank]
+        return self.ids[position], self.string(self.names[position]), self.string(self.category_images[position])
+
+
+class SharedCatalog:
+    """워커들이 함께 쓰는 카탈로그 스냅샷을 관리한다.
+
+    카탈로그 버전이 바뀌면 파일 잠금을 잡은 워커 하나만 DB에서 스냅샷을 만들고, 나머지 워커는 그 파일을 매핑한다.
+    새 매핑은 참조만 바꿔 끼우므로 조회 중인 요청은 이전 스냅샷을 끝까지 쓴다.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        self.builds = 0
+        self.loaded_at: Optional[float] = None
+
+    def _open(self, min_version: int) -> Optional[CatalogSnapshot]:
+        try:
+            snapshot = CatalogSnapshot(self.path)
+        except (FileNotFoundError, ValueError):
+            return None
+        # 복제본이 뒤처져 더 낮은 버전을 봤더라도 이미 만들어진 새 파일은 그대로 쓴다
+        return snapshot if snapshot.version >= min_version else None
+
+    def _lock(self):
+        lock = open(f"{self.path}.lock", "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    async def refresh(self) -> bool:
+        db = await snapshot_session(replica_router.session)
+        try:
+            version = await get_catalog_version(db)
+            if self.snapshot is not None and self.snapshot.version >= version:
+                return False
+
+            snapshot = self._open(version)
+            if snapshot is None:
+                lock = await asyncio.to_thread(self._lock)
+                try:
+                    # 잠금을 기다리는 동안 다른 워커가 만들었을 수 있다
+                    snapshot = self._open(version)
+                    if snapshot is None:
+                        started = time.perf_counter()
+                        columns = await build_columns(db)
+                        await asyncio.to_thread(write_snapshot, self.path, version, columns)
+                        snapshot = self._open(version)
+                        self.builds += 1
+                        logger.info("built catalog snapshot v%d in %.2fs", version, time.perf_counter() - started)
+                finally:
+                    lock.close()
+        finally:
+            await db.close()
+
+        # 자동완성 열은 스냅샷을 만들 때 한 번만 계산해 두었으므로 매핑한 파일을 가리키기만 한다
+        autocomplete_index.load(len(snapshot.rank_order), snapshot.ranked_entry, snapshot.forms)
+        self.snapshot = snapshot
+        # 다른 워커가 추가한 품목은 새 스냅샷에서야 보이므로 이때 검색어 응답과 미스 기록을 비운다
+        item_response_cache.invalidate_kind(SEARCH_CACHE_KIND)
+        negative_cache.invalidate()
+        self.loaded_at = time.time()
+        return True
+
+    def has_item(self, item_id: int) -> bool:
+        snapshot = self.snapshot
+        return snapshot is not None and snapshot.find_id(item_id) is not None
+
+    def verdict(self, scope: str, id: Optional[int] = None, name: Optional[str] = None) -> Optional[dict]:
+        # 스냅샷 이후 추가된 품목이면 None이므로 호출한 쪽이 DB에서 읽는다
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if id is not None:
+            position = snapshot.find_id(id)
+        elif name:
+            position = snapshot.find_name(name)
+        else:
+            return None
+        return snapshot.verdict(position, scope) if position is not None else None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("catalog snapshot refresh failed")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def trigger(self):
+        # 다음 확인 주기를 기다리지 않고 바로 버전을 확인한다. 갱신은 백그라운드 작업이 하므로 기다리지 않는다
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "path": self.path,
+            "version": snapshot.version if snapshot else None,
+            "items": snapshot.count if snapshot else 0,
+            "size_bytes": snapshot.size if snapshot else 0,
+            "builds": self.builds,
+            "loaded_at": self.loaded_at,
+        }
+
+
+shared_catalog = SharedCatalog(settings.snapshot_path, settings.snapshot_check_interval)
@@ -0,0 +1,79 @@
+import gzip
+import os
+from typing import Dict, Iterable, NamedTuple
+
+from fastapi import Request, Response
+
+from app.cache import etag_matches, make_etag
+
+try:
+    import brotli
+except ImportError:  # brotli는 선택 의존성. 없으면 gzip만 미리 압축해 둔다
+    brotli = None
+
+
+class StaticPage(NamedTuple):
+    # content-coding("identity", "gzip", "br") -> (본문, ETag)
+    variants: Dict[str, tuple]
+    media_type: str
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str]) -> str:
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+
+class StaticPages:
+    """관리자 폼 같은 정적 HTML을 기동 시 한 번 읽어 메모리에 두고, gzip/brotli 압축본을 미리 만들어 둔다.
+
+    요청마다 디스크를 읽거나 압축하지 않고 Accept-Encoding에 맞는 본문을 골라 ETag와 함께 응답한다.
+    """
+
+    def __init__(self, directory: str, max_age: int):
+        self.directory = directory
+        self.cache_control = f"public, max-age={max_age}"
+        self._pages: Dict[str, StaticPage] = {}
+
+    def load(self, name: str, media_type: str = "text/html; charset=utf-8") -> StaticPage:
+        with open(os.path.join(self.directory, name), "rb") as file:
+            body = file.read()
+        etag = make_etag(body)
+        # 같은 URL이라도 인코딩마다 본문이 다르므로 strong ETag도 구분한다
+        variants = {"identity": (body, etag), "gzip": (gzip.compress(body, compresslevel=9, mtime=0), etag[:-1] + '-gzip"')}
+        if brotli is not None:
+            variants["br"] = (brotli.compress(body, quality=11), etag[:-1] + '-br"')
+        page = self._pages[name] = StaticPage(variants, media_type)
+        return page
+
+    def response(self, request: Request, name: str) -> Response:
+        page = self._pages.get(name) or self.load(name)
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), page.variants)
+        body, etag = page.variants[encoding]
+
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=page.media_type, headers=headers)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_right
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+from app.crud import delete_search_history_buckets, get_top_search_histories, get_trending_search_terms
+from app.database import SessionLocal, settings
+from app.replicas import replica_router
+from app.schemas import TrendingWindow
+from app.search_history import current_bucket
+
+logger = logging.getLogger(__name__)
+
+# 집계 구간별 길이. None은 search_history의 전체 누적 횟수를 쓴다
+WINDOWS: Dict[TrendingWindow, Optional[timedelta]] = {
+    TrendingWindow.day: timedelta(hours=24),
+    TrendingWindow.week: timedelta(days=7),
+    TrendingWindow.all_time: None,
+}
+
+# 가장 긴 구간보다 한 시간 더 남겨 두고 그 이전 버킷은 지운다
+RETENTION = timedelta(days=7, hours=1)
+PRUNE_INTERVAL = 3600
+
+
+class TrendingEntry(NamedTuple):
+    search_term: str
+    prohibited_item_id: int
+    search_count: int
+
+
+class TrendingSearches:
+    """구간별 인기 검색어 상위 K개를 주기적으로 다시 계산해 메모리에 들고 있는다.
+
+    /search_history는 DB를 정렬하지 않고 이 목록을 잘라서 응답한다.
+    """
+
+    def __init__(self, refresh_interval: float, top_k: int):
+        self.refresh_interval = refresh_interval
+        self.top_k = top_k
+        self._top: Dict[TrendingWindow, List[TrendingEntry]] = {window: [] for window in WINDOWS}
+        # 커서 위치를 이분 탐색하기 위한 정렬 키 (-검색 횟수, 검색어)
+        self._keys: Dict[TrendingWindow, List[Tuple[int, str]]] = {window: [] for window in WINDOWS}
+        # (구간, limit) -> 첫 페이지 응답 본문과 마지막 항목. 다음 갱신 전까지 재사용한다
+        self._encoded: Dict[Tuple[TrendingWindow, int], Tuple[bytes, Optional[TrendingEntry]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_pruned = 0.0
+
+        self.refreshed_at: Optional[float] = None
+
+    def top(self, window: TrendingWindow, limit: int, after: Optional[Tuple[int, str]] = None) -> List[TrendingEntry]:
+        # after는 이전 페이지 마지막 항목의 (검색 횟수, 검색어). 그 다음 항목부터 limit건을 돌려준다
+        start = bisect_right(self._keys[window], (-after[0], after[1])) if after is not None else 0
+        return self._top[window][start:start + limit]
+
+    def page(self, window: TrendingWindow, limit: int,
+             after: Optional[Tuple[int, str]] = None) -> Tuple[bytes, Optional[TrendingEntry]]:
+        """(응답 본문, 다음 페이지가 있으면 이번 페이지의 마지막 항목)을 반환한다."""
+        key = (window, limit)
+        if after is None and key in self._encoded:
+            return self._encoded[key]
+
+        entries = self.top(window, limit + 1, after)
+        last = entries[limit - 1] if len(entries) > limit else None
+        page = orjson.dumps([
+            {"prohibited_item_id": entry.prohibited_item_id, "search_term": entry.search_term}
+            for entry in entries[:limit]
+        ]), last
+        if after is None:
+            self._encoded[key] = page
+        return page
+
+    async def refresh(self):
+        now = current_bucket()
+        top = {}
+        async with replica_router.session() as db:
+            for window, length in WINDOWS.items():
+                if length is None:
+                    histories = await get_top_search_histories(db, limit=self.top_k)
+                    top[window] = [TrendingEntry(history.search_term, history.prohibited_item_id, history.search_count)
+                                   for history in histories]
+                else:
+                    rows = await get_trending_search_terms(db, since=now - length + timedelta(hours=1), limit=self.top_k)
+                    top[window] = [TrendingEntry(*row) for row in rows]
+
+        if time.monotonic() - self._last_pruned > PRUNE_INTERVAL:
+            async with SessionLocal() as db:
+                await delete_search_history_buckets(db, before=now - RETENTION)
+            self._last_pruned = time.monotonic()
+
+        for entries in top.values():
+            # DB 정렬 규칙(collation)과 관계없이 커서 비교와 같은 순서가 되도록 다시 정렬한다
+            entries.sort(key=lambda entry: (-entry.search_count, entry.search_term))
+        self._top = top
+        self._keys = {window: [(-entry.search_count, entry.search_term) for entry in entries] for window, entries in top.items()}
+        self._encoded = {}
+        self.refreshed_at = time.time()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("trending searches refresh failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+trending_searches = TrendingSearches(settings.trending_refresh_interval, settings.trending_top_k)
@@ -0,0 +1,62 @@
+from typing import List, Optional
+
+# scope -> (is_international, is_domestic). 상세 API의 항공편 쿼리 파라미터 조합과 1:1로 대응한다
+SCOPES = {
+    "all": (False, False),
+    "international": (True, False),
+    "domestic": (False, True),
+    "both": (True, True),
+}
+
+
+def get_scope(is_international: Optional[bool] = None, is_domestic: Optional[bool] = None) -> str:
+    if is_international and is_domestic:
+        return "both"
+    if is_international:
+        return "international"
+    if is_domestic:
+        return "domestic"
+    return "all"
+
+
+def get_availability(allowed: List[bool]) -> str:
+    if True in allowed and False in allowed:
+        return '△'
+    return 'O' if all(allowed) else 'X'
+
+
+def build_field_verdict(conditions, field_option: str) -> dict:
+    field_conditions = [condition for condition in conditions if condition.field_option.option == field_option]
+    return {
+        "availability": get_availability([condition.allowed for condition in field_conditions]),
+        "condition_description": [condition.condition for condition in field_conditions]
+    }
+
+
+def build_verdict_row(item, conditions, scope: str) -> dict:
+    subcategory = item.subcategory
+    category = subcategory.category if subcategory else None
+    return {
+        "prohibited_item_id": item.id,
+        "scope": scope,
+        "item_name": item.item_name,
+        "category": category.name if category else None,
+        "subcategory": subcategory.name if subcategory else None,
+        "image_path": item.image_path,
+        "flight_option": conditions[0].flight_option.option if conditions else None,
+        "cabin": build_field_verdict(conditions, "cabin"),
+        "trust": build_field_verdict(conditions, "trust")
+    }
+
+
+def verdict_to_dict(verdict) -> dict:
+    return {
+        "id": verdict.prohibited_item_id,
+        "category": verdict.category,
+        "subcategory": verdict.subcategory,
+        "item_name": verdict.item_name,
+        "image_path": verdict.image_path,
+        "flight_option": verdict.flight_option,
+        "cabin": verdict.cabin,
+        "trust": verdict.trust
+    }
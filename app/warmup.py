@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.cache import reference_cache
+from app.crud import get_categories, get_field_options, get_flight_options, refresh_missing_item_verdicts
+from app.database import SessionLocal, engine, settings
+from app.migrations import get_pending_migrations
+from app.pagination import get_subcategory_page
+from app.schemas import Category, FieldOption, FlightOption
+from app.snapshot import shared_catalog
+from app.trending import trending_searches
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_INTERVAL = 60.0
+
+# 참조 데이터 캐시 키 -> (응답 스키마, 조회 함수). main.py의 목록 API와 같은 키를 쓴다
+REFERENCE_DATA = {
+    "categories": (Category, get_categories),
+    "flight_options": (FlightOption, get_flight_options),
+    "field_options": (FieldOption, get_field_options),
+}
+
+
+async def check_migrations():
+    async with engine.connect() as conn:
+        pending = await get_pending_migrations(conn)
+    if pending:
+        raise RuntimeError(f"pending migrations: {[migration.version for migration in pending]} (run python -m app.migrations)")
+
+
+def with_session(fetch: Callable) -> Callable[[], Awaitable]:
+    async def step():
+        async with SessionLocal() as db:
+            await fetch(db)
+    return step
+
+
+def warm_reference(key: str) -> Callable[[], Awaitable]:
+    schema, fetch = REFERENCE_DATA[key]
+    return with_session(lambda db: reference_cache.get(key, schema, lambda: fetch(db)))
+
+
+class WarmUp:
+    """기동 직후 DB에서 인덱스와 캐시를 채우는 단계들을 동시 실행 수를 제한해 병렬로 돌린다.
+
+    import나 lifespan을 막지 않고 백그라운드에서 실행하며, 실패한 단계만 간격을 늘려 가며 다시 시도한다.
+    모든 단계가 끝나야 ready가 되고 /health/ready가 200을 반환한다.
+    """
+
+    def __init__(self, concurrency: int, step_timeout: float, retry_interval: float):
+        self.concurrency = concurrency
+        self.step_timeout = step_timeout
+        self.retry_interval = retry_interval
+        # 스키마 확인이 끝나야 나머지 단계를 실행한다
+        self._prerequisites: List[Tuple[str, Callable[[], Awaitable]]] = [("migrations", check_migrations)]
+        self._steps: List[Tuple[str, Callable[[], Awaitable]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.status: Dict[str, dict] = {}
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def add(self, name: str, step: Callable[[], Awaitable]):
+        self._steps.append((name, step))
+
+    async def _run_step(self, semaphore: asyncio.Semaphore, name: str, step: Callable[[], Awaitable]) -> bool:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(step(), self.step_timeout)
+            except Exception as e:
+                logger.warning("warm-up step %s failed: %r", name, e)
+                self.status[name] = {"status": "failed", "error": repr(e), "seconds": round(time.perf_counter() - started, 3)}
+                return False
+            self.status[name] = {"status": "done", "seconds": round(time.perf_counter() - started, 3)}
+            return True
+
+    async def _run_all(self, steps: List[Tuple[str, Callable[[], Awaitable]]]) -> List[Tuple[str, Callable[[], Awaitable]]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for name, _ in steps:
+            self.status[name] = {"status": "running"}
+        results = await asyncio.gather(*(self._run_step(semaphore, name, step) for name, step in steps))
+        return [entry for entry, ok in zip(steps, results) if not ok]
+
+    async def run(self):
+        self.started_at = time.time()
+        for name, _ in self._prerequisites + self._steps:
+            self.status[name] = {"status": "pending"}
+
+        interval = self.retry_interval
+        prerequisites, steps = self._prerequisites, self._steps
+        while True:
+            prerequisites = await self._run_all(prerequisites)
+            if not prerequisites:
+                steps = await self._run_all(steps)
+                if not steps:
+                    break
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, MAX_RETRY_INTERVAL)
+
+        self.ready = True
+        self.finished_at = time.time()
+        logger.info("warm-up finished in %.2fs", self.finished_at - self.started_at)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> dict:
+        return {"ready": self.ready, "steps": self.status}
+
+
+warmup = WarmUp(settings.warmup_concurrency, settings.warmup_step_timeout, settings.warmup_retry_interval)
+
+
+# 스냅샷은 판정 테이블로 만들므로 빠진 판정을 먼저 채운다. 자동완성 인덱스도 스냅샷에서 채워진다
+async def warm_catalog_snapshot():
+    await with_session(refresh_missing_item_verdicts)()
+    await shared_catalog.refresh()
+
+
+warmup.add("catalog_snapshot", warm_catalog_snapshot)
+warmup.add("trending", trending_searches.refresh)
+for key in REFERENCE_DATA:
+    warmup.add(f"reference:{key}", warm_reference(key))
+warmup.add("reference:subcategories", with_session(get_subcategory_page))
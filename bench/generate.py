@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from app.crud import refresh_item_verdicts
+from app.database import SessionLocal, engine
+from app.migrations import migrate
+
+CATEGORIES = {
+    "배터리": ["보조배터리", "리튬배터리", "전자담배"],
+    "액체류": ["화장품", "음료", "의약품"],
+    "날붙이": ["칼", "가위", "공구"],
+    "인화성 물질": ["라이터", "가스", "스프레이"],
+    "스포츠용품": ["구기용품", "캠핑용품", "낚시용품"],
+    "식품": ["소스", "주류", "건어물"],
+}
+
+MODIFIERS = ["휴대용", "소형", "대형", "접이식", "충전식", "일회용", "전동", "무선", "여행용", "캠핑용",
+             "고급", "미니", "가정용", "업소용", "어린이용", "방수", "자동", "수동", "스테인리스", "플라스틱"]
+
+NOUNS = ["보조배터리", "라이터", "가위", "커터칼", "헤어스프레이", "향수", "선크림", "샴푸", "치약", "전자담배",
+         "드라이기", "고데기", "면도기", "캠핑가스", "버너", "망치", "드라이버", "렌치", "낚싯대", "골프채",
+         "야구방망이", "텐트폴", "소주", "와인", "고추장", "김치", "참기름", "손톱깎이", "우산", "등산스틱",
+         "노트북", "태블릿", "카메라", "드론", "전동킥보드", "체온계", "인슐린", "렌즈세척액", "물티슈", "손소독제"]
+
+SPECS = ["100ml", "500ml", "1L", "10000mAh", "20000mAh", "30cm", "6cm", "2개입", "세트", "리필"]
+
+CONDITIONS = [
+    ("100ml 이하 용기에 담아 1L 지퍼백에 넣으면 반입 가능", True),
+    ("1인당 1개까지 반입 가능", True),
+    ("160Wh 이하만 반입 가능, 항공사 승인 필요", True),
+    ("칼날 6cm 이하만 반입 가능", True),
+    ("기내 반입 불가, 위탁 수하물로만 운송 가능", False),
+    ("위탁 수하물 반입 불가", False),
+    ("단자를 절연 테이프로 감싸야 함", True),
+    ("의사 처방전 등 증빙 서류 지참 시 반입 가능", True),
+    ("알코올 도수 70% 초과 시 반입 불가", False),
+    ("보안 검색 요원의 판단에 따라 반입이 제한될 수 있음", True),
+]
+
+COPY_CHUNK = 50_000
+
+
+def item_names(count: int, rng: random.Random) -> List[str]:
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = f"{rng.choice(MODIFIERS)} {rng.choice(NOUNS)}"
+        if rng.random() < 0.5:
+            name += f" {rng.choice(SPECS)}"
+        # 조합이 다 쓰이면 모델 번호를 붙여 이름이 겹치지 않게 한다
+        if name in seen:
+            name += f" {rng.randrange(1, 10_000)}"
+            if name in seen:
+                continue
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+async def seed_reference_data(conn):
+    if (await conn.execute(text("SELECT count(*) FROM category"))).scalar():
+        return
+    await conn.execute(text("INSERT INTO flight_options (id, option) VALUES (1, '국제선'), (2, '국내선') ON CONFLICT DO NOTHING"))
+    await conn.execute(text("INSERT INTO field_options (id, option) VALUES (1, 'cabin'), (2, 'trust') ON CONFLICT DO NOTHING"))
+    for category, subcategories in CATEGORIES.items():
+        category_id = (await conn.execute(
+            text("INSERT INTO category (name, image) VALUES (:name, :image) RETURNING id"),
+            {"name": category, "image": f"/static/images/category/{category}.png"}
+        )).scalar()
+        for subcategory in subcategories:
+            await conn.execute(text("INSERT INTO subcategory (category_id, name) VALUES (:category_id, :name)"),
+                               {"category_id": category_id, "name": subcategory})
+
+
+def build_rows(first_id: int, names: List[str], subcategory_ids: List[int],
+               rng: random.Random) -> Tuple[list, list]:
+    items, conditions = [], []
+    for offset, name in enumerate(names):
+        item_id = first_id + offset
+        items.append((item_id, rng.choice(subcategory_ids), name, f"/static/images/items/{item_id}.png"))
+        for _ in range(rng.randint(2, 8)):
+            condition, allowed = rng.choice(CONDITIONS)
+            conditions.append((item_id, rng.randint(1, 2), rng.randint(1, 2), condition, allowed))
+    return items, conditions
+
+
+async def generate(count: int, seed: int, reset: bool, verdicts: bool):
+    rng = random.Random(seed)
+    await migrate()
+
+    async with engine.begin() as conn:
+        if reset:
+            await conn.execute(text(
+                "TRUNCATE prohibited_items, conditions, item_verdicts, search_history, search_history_hourly RESTART IDENTITY CASCADE"
+            ))
+        await seed_reference_data(conn)
+        subcategory_ids = (await conn.execute(text("SELECT id FROM subcategory ORDER BY id"))).scalars().all()
+        first_id = (await conn.execute(text("SELECT coalesce(max(id), 0) + 1 FROM prohibited_items"))).scalar()
+
+    names = item_names(count, rng)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        # search_vector는 트리거가 채우므로 COPY에서도 그대로 계산된다
+        raw = (await conn.get_raw_connection()).driver_connection
+        for start in range(0, count, COPY_CHUNK):
+            items, conditions = build_rows(first_id + start, names[start:start + COPY_CHUNK], subcategory_ids, rng)
+            await raw.copy_records_to_table(
+                "prohibited_items", records=items, columns=["id", "subcategory_id", "item_name", "image_path"])
+            await raw.copy_records_to_table(
+                "conditions", records=conditions,
+                columns=["prohibited_item_id", "flight_option_id", "field_option_id", "condition", "allowed"])
+            print(f"copied {min(start + COPY_CHUNK, count)}/{count} items")
+        await conn.execute(text("SELECT setval(pg_get_serial_sequence('prohibited_items', 'id'), max(id)) FROM prohibited_items"))
+        await conn.execute(text("SELECT setval(pg_get_serial_sequence('conditions', 'id'), max(id)) FROM conditions"))
+    print(f"copied {count} items in {time.perf_counter() - started:.1f}s")
+
+    if verdicts:
+        started = time.perf_counter()
+        async with SessionLocal() as db:
+            for start in range(0, count, 1000):
+                ids = list(range(first_id + start, first_id + min(start + 1000, count)))
+                await refresh_item_verdicts(db, ids)
+                await db.commit()
+                db.expunge_all()
+        print(f"built verdicts in {time.perf_counter() - started:.1f}s")
+
+    async with engine.begin() as conn:
+        # COPY는 카탈로그 변경 로그를 거치지 않으므로 새 기준점을 남겨 스냅샷과 동기화 클라이언트가 다시 받게 한다
+        await conn.execute(text("INSERT INTO catalog_changes (entity, change) VALUES ('catalog', 'baseline')"))
+        await conn.execute(text("ANALYZE"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="벤치마크용 가상 금지 품목 카탈로그를 로컬 Postgres에 생성합니다.")
+    parser.add_argument("--items", type=int, default=1000, help="생성할 품목 수 (예: 1000, 100000, 1000000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="기존 품목/조건/검색 기록을 비우고 생성")
+    parser.add_argument("--skip-verdicts", action="store_true", help="판정 테이블은 서버 시작 시 채우도록 남겨 둔다")
+    args = parser.parse_args()
+    asyncio.run(generate(args.items, args.seed, args.reset, not args.skip_verdicts))
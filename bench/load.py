@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import text
+
+from app.database import engine
+
+# 이름 -> (설명, 요청 경로를 만드는 함수)
+SCENARIOS: Dict[str, Tuple[str, Callable[[random.Random, list], str]]] = {
+    "items": ("자동완성 검색", lambda rng, sample: f"/items/?search_term={rng.choice(sample)[1][:rng.randint(1, 4)]}"),
+    "item_detail": ("품목 상세", lambda rng, sample: f"/items/{rng.choice(sample)[0]}/?is_international=true"),
+    "search_conditions": ("품목명 상세 검색", lambda rng, sample: f"/items/search/conditions/?search_term={rng.choice(sample)[1]}"),
+    "search_history": ("인기 검색어", lambda rng, sample: "/search_history?limit=10"),
+}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # nearest-rank 방식
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+async def load_sample(size: int, seed: int) -> list:
+    # 실제로 있는 품목 id/이름을 seed로 고정된 순서로 골라 요청에 쓴다
+    async with engine.connect() as conn:
+        rows = (await conn.execute(
+            text("SELECT id, item_name FROM prohibited_items ORDER BY md5(id::text || :seed) LIMIT :size"),
+            {"seed": str(seed), "size": size}
+        )).all()
+    await engine.dispose()
+    if not rows:
+        sys.exit("prohibited_items가 비어 있습니다. 먼저 python -m bench.generate를 실행하세요.")
+    return rows
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, sample: list, concurrency: int,
+                       duration: float, warmup: float, seed: int) -> dict:
+    make_path = SCENARIOS[name][1]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+
+    async def worker(worker_id: int, deadline: float, record: bool):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            path = make_path(rng, sample)
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            elapsed = time.perf_counter() - started
+            if not record:
+                continue
+            if status is None:
+                errors += 1
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            # 404는 검색 결과 없음이라는 정상 응답이다
+            if status >= 500 or status == 429:
+                errors += 1
+            latencies.append(elapsed)
+
+    if warmup:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(i, deadline, False) for i in range(concurrency)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i, started + duration, True) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "description": SCENARIOS[name][0],
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": errors,
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for key in ("p50", "p95", "p99"):
+            before, after = previous["latency_ms"][key], current["latency_ms"][key]
+            if before and after > before * (1 + threshold):
+                regressions.append(f"{name} {key}: {before}ms -> {after}ms")
+        before, after = previous["throughput_rps"], current["throughput_rps"]
+        if before and after < before * (1 - threshold):
+            regressions.append(f"{name} throughput: {before} -> {after} rps")
+    return regressions
+
+
+async def main(args):
+    sample = await load_sample(args.sample_size, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "base_url": args.base_url,
+        "python": platform.python_version(),
+        "sample_size": len(sample),
+        "scenarios": {},
+    }
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        for name in args.scenarios:
+            result["scenarios"][name] = await run_scenario(
+                client, name, sample, args.concurrency, args.duration, args.warmup, args.seed)
+            print(f"{name}: {json.dumps(result['scenarios'][name], ensure_ascii=False)}", file=sys.stderr)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="주요 조회 API에 동시 요청을 보내 처리량과 지연 시간 분위를 JSON으로 기록합니다.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="시나리오별 측정 시간(초)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="측정 전 예열 시간(초)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--sample-size", type=int, default=5000, help="요청에 쓸 품목 표본 수")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 JSON 파일 경로 (생략 시 표준 출력)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON. 회귀가 있으면 종료 코드 1")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀로 볼 지연/처리량 변화 비율")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+import argparse
+import sys
+import time
+from typing import List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.cache import item_response_cache, negative_cache, reference_cache
+from app.database import SessionLocal
+from app.main import app
+from app.profiling import QUERY_BUDGETS, QueryBudgetExceeded, query_budget
+from app.snapshot import shared_catalog
+from app.warmup import warmup
+
+
+def build_requests(items: List[Tuple[int, str]]) -> List[Tuple[str, str, dict]]:
+    requests = [("GET", path, {}) for path in ("/categories/", "/subcategories/", "/flight_options/", "/field_options/",
+                                              "/search_history", "/catalog/version")]
+    for item_id, item_name in items:
+        requests += [
+            ("GET", f"/items/{item_id}/", {"params": {"is_international": "true"}}),
+            ("GET", "/items/search/conditions/", {"params": {"search_term": item_name}}),
+            ("GET", "/items/", {"params": {"search_term": item_name[:2]}}),
+        ]
+    requests.append(("POST", "/items/verdicts/", {"json": {"item_ids": [item_id for item_id, _ in items],
+                                                          "item_names": [item_name for _, item_name in items]}}))
+    return requests
+
+
+def reset_caches():
+    # 요청마다 캐시를 비워 항상 DB까지 가게 한다
+    item_response_cache.clear()
+    reference_cache.invalidate()
+    negative_cache.invalidate()
+
+
+def check_detail_query_count(client: TestClient, item_ids: List[int]) -> bool:
+    # 상세 조회의 쿼리 수는 품목의 조건 수와 관계없이 같아야 한다 (조건별 N+1 회귀 검사).
+    # 지금의 상세 조회는 판정 테이블 PK 조회 한 번이므로, 조건을 다시 관계로 읽게 바뀌는 회귀를 잡는다
+    counts = {}
+    for item_id in item_ids:
+        reset_caches()
+        with query_budget() as statements:
+            client.get(f"/items/{item_id}/", params={"is_international": "true"})
+        counts[item_id] = sum(len(executed) for executed in statements.values())
+    if len(set(counts.values())) > 1:
+        print(f"FAIL detail query count depends on condition count: {counts}")
+        return False
+    print(f"ok   detail query count is constant across condition counts: {counts}")
+    return True
+
+
+def main(sample: int) -> int:
+    with TestClient(app) as client:
+        while not warmup.ready:
+            time.sleep(0.1)
+        # 캐시와 공유 스냅샷을 빼고 DB까지 가는 경로의 쿼리 수를 잰다. 주기적 갱신을 먼저 멈추지 않으면
+        # 도중에 스냅샷이 다시 매핑되어 이후 요청이 DB를 건너뛴 채 통과한다
+        client.portal.call(shared_catalog.stop)
+        shared_catalog.snapshot = None
+
+        async def load_items():
+            async with SessionLocal() as db:
+                result = await db.execute(text("SELECT id, item_name FROM prohibited_items ORDER BY id LIMIT :size"),
+                                          {"size": sample})
+                return [tuple(row) for row in result]
+
+        async def load_items_by_condition_count():
+            # 조건이 가장 적은 품목과 가장 많은 품목
+            async with SessionLocal() as db:
+                result = await db.execute(text(
+                    "(SELECT prohibited_item_id FROM conditions GROUP BY prohibited_item_id ORDER BY count(*), prohibited_item_id LIMIT 1)"
+                    " UNION ALL "
+                    "(SELECT prohibited_item_id FROM conditions GROUP BY prohibited_item_id ORDER BY count(*) DESC, prohibited_item_id LIMIT 1)"
+                ))
+                return list(result.scalars())
+
+        failures = 0
+        if not check_detail_query_count(client, client.portal.call(load_items_by_condition_count)):
+            failures += 1
+        for method, path, kwargs in build_requests(client.portal.call(load_items)):
+            reset_caches()
+            try:
+                with query_budget() as statements:
+                    client.request(method, path, **kwargs)
+            except QueryBudgetExceeded as e:
+                failures += 1
+                print(f"FAIL {e}")
+                continue
+            for (route, _), executed in statements.items():
+                print(f"ok   {route}: {len(executed)}/{QUERY_BUDGETS.get(route, '-')} queries")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="엔드포인트별 요청당 쿼리 수가 app.profiling.QUERY_BUDGETS를 넘는지 확인합니다. "
+                                                 "넘으면 종료 코드 1 (CI에서 N+1 회귀 검사용).")
+    parser.add_argument("--sample", type=int, default=3, help="검사에 쓸 품목 수")
+    args = parser.parse_args()
+    sys.exit(main(args.sample))
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import sys
+import timeit
+from typing import Callable, Dict, Union
+
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas import ItemNotFound, ProhibitedItemBase, ProhibitedItemCondition, ProhibitedItemList
+
+# 상세 API가 응답하는 판정 한 건 (verdict_to_dict 결과와 같은 형태)
+DETAIL = {
+    "id": 1234,
+    "category": "배터리",
+    "subcategory": "보조배터리",
+    "item_name": "휴대용 보조배터리 20000mAh",
+    "image_path": "/static/images/items/1234.png",
+    "flight_option": "국제선",
+    "cabin": {"availability": "△", "condition_description": ["160Wh 이하만 반입 가능, 항공사 승인 필요", "1인당 1개까지 반입 가능"]},
+    "trust": {"availability": "X", "condition_description": ["위탁 수하물 반입 불가"]},
+}
+
+# 자동완성 기본 limit(20)만큼의 결과
+AUTOCOMPLETE = [
+    {"id": 1000 + i, "item_name": f"휴대용 보조배터리 {i}", "category_image": "/static/images/category/배터리.png"}
+    for i in range(20)
+]
+
+DETAIL_FIELD = create_response_field("detail", Union[ProhibitedItemCondition, ItemNotFound])
+AUTOCOMPLETE_FIELD = create_response_field("autocomplete", Union[ProhibitedItemList, ItemNotFound])
+
+
+LOOP = asyncio.new_event_loop()
+
+
+def run_async(coroutine_function: Callable) -> Callable[[], object]:
+    return lambda: LOOP.run_until_complete(coroutine_function())
+
+
+async def noop():
+    pass
+
+
+async def detail_response_model():
+    # 기존 방식: dict를 반환하면 FastAPI가 response_model로 검증한 뒤 표준 json으로 인코딩한다
+    return JSONResponse(await serialize_response(field=DETAIL_FIELD, response_content=DETAIL)).body
+
+
+async def autocomplete_response_model():
+    # 기존 방식: 모델을 만들고 response_model로 다시 검증한 뒤 표준 json으로 인코딩한다
+    content = ProhibitedItemList(items=[ProhibitedItemBase(**item) for item in AUTOCOMPLETE])
+    return JSONResponse(await serialize_response(field=AUTOCOMPLETE_FIELD, response_content=content)).body
+
+
+PRE_ENCODED_DETAIL = orjson.dumps(DETAIL)
+
+CASES: Dict[str, Dict[str, Callable[[], object]]] = {
+    "detail": {
+        "response_model_json": run_async(detail_response_model),
+        "pydantic_dump_json": lambda: Response(content=ProhibitedItemCondition(**DETAIL).model_dump_json().encode(),
+                                               media_type="application/json").body,
+        "orjson": lambda: Response(content=orjson.dumps(DETAIL), media_type="application/json").body,
+        "pre_encoded": lambda: Response(content=PRE_ENCODED_DETAIL, media_type="application/json").body,
+    },
+    "autocomplete": {
+        "response_model_json": run_async(autocomplete_response_model),
+        "orjson": lambda: ORJSONResponse(content={"items": AUTOCOMPLETE}).body,
+    },
+}
+
+
+def measure(function: Callable[[], object], repeat: int, min_time: float) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(repeat: int, min_time: float) -> dict:
+    loop_overhead = measure(run_async(noop), repeat, min_time) * 1e6
+    result = {"python": sys.version.split()[0], "orjson": orjson.__version__, "unit": "us_per_response",
+              "event_loop_overhead_us": round(loop_overhead, 2), "cases": {}}
+    for case, variants in CASES.items():
+        # 모든 방식이 같은 JSON을 만드는지 먼저 확인한다
+        bodies = {json.dumps(json.loads(variant()), sort_keys=True) for variant in variants.values()}
+        assert len(bodies) == 1, f"{case}: serializers disagree"
+
+        timings = {name: measure(variant, repeat, min_time) * 1e6 for name, variant in variants.items()}
+        # serialize_response는 코루틴이라 이벤트 루프로 돌리는 비용은 빼고 비교한다
+        timings["response_model_json"] -= loop_overhead
+        baseline = timings["response_model_json"]
+        result["cases"][case] = {
+            name: {"us": round(us, 2), "speedup": round(baseline / us, 2)} for name, us in timings.items()
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="상세/자동완성 응답의 직렬화 방식별 요청당 CPU 시간을 측정합니다.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="반복 1회당 최소 측정 시간(초)")
+    args = parser.parse_args()
+    print(json.dumps(main(args.repeat, args.min_time), ensure_ascii=False, indent=2))
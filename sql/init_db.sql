@@ -39,10 +39,9 @@ ALTER TABLE prohibited_items ADD COLUMN search_vector tsvector;
 CREATE OR REPLACE FUNCTION update_search_vector() RETURNS trigger AS $$
 BEGIN
     NEW.search_vector :=
-        to_tsvector('pg_catalog.english', coalesce(NEW.category, '') || ' ' ||
-                    coalesce(NEW.subcategory, '') || ' ' ||
-                    coalesce(NEW.item_name, '') || ' ' ||
-                    coalesce(NEW.description, ''));
+        setweight(to_tsvector('simple', coalesce(NEW.item_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM subcategory WHERE id = NEW.subcategory_id), '')), 'B');
     RETURN NEW;
 END
 $$ LANGUAGE plpgsql;
@@ -50,4 +49,7 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER tsvectorupdate BEFORE INSERT OR UPDATE
 ON prohibited_items FOR EACH ROW EXECUTE FUNCTION update_search_vector();
 
-CREATE INDEX idx_search_vector ON prohibited_items USING gin(search_vector);
\ No newline at end of file
+CREATE INDEX idx_search_vector ON prohibited_items USING gin(search_vector);
+
+-- 오타 허용 검색(word_similarity)용 트라이그램 인덱스
+CREATE INDEX idx_prohibited_items_item_name_trgm ON prohibited_items USING gin(item_name gin_trgm_ops);
\ No newline at end of file